@@ -0,0 +1,133 @@
+"""
+Benchmark the JSON codecs on realistic ComfyUI payloads.
+
+Encodes a large API-format workflow (as sent by `queue_prompt`) and decodes a
+large `/history` document (as parsed by `get_history_all`) with every
+installed codec.
+
+Usage:
+    python benchmarks/bench_codec.py [--nodes 400] [--history 2000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from comfyui_xy.codec import available_codecs, get_codec
+from comfyui_xy.history import JsonObjectStream
+
+_WORDS = ("masterpiece best quality cinematic lighting portrait landscape detailed "
+          "sharp focus volumetric fog golden hour bokeh 35mm film grain").split()
+
+
+def _text(rng, words):
+    return ', '.join(rng.choice(_WORDS) for _ in range(words))
+
+
+def make_workflow(nodes, rng):
+    """A chain of sampler stages, similar in shape to large exported workflows."""
+    workflow = {
+        "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "sd_xl_base_1.0.safetensors"}},
+        "2": {"class_type": "EmptyLatentImage", "inputs": {"width": 1024, "height": 1024, "batch_size": 1}},
+    }
+    latent = ["2", 0]
+    node_id = 3
+    while node_id + 5 <= nodes:
+        pos, neg, sampler, decode, save = (str(node_id + i) for i in range(5))
+        workflow[pos] = {"class_type": "CLIPTextEncode", "inputs": {"text": _text(rng, 60), "clip": ["1", 1]}}
+        workflow[neg] = {"class_type": "CLIPTextEncode", "inputs": {"text": _text(rng, 20), "clip": ["1", 1]}}
+        workflow[sampler] = {"class_type": "KSampler", "inputs": {
+            "seed": rng.randint(0, 2 ** 48), "steps": 30, "cfg": 6.5, "sampler_name": "dpmpp_2m",
+            "scheduler": "karras", "denoise": 0.55, "model": ["1", 0], "positive": [pos, 0],
+            "negative": [neg, 0], "latent_image": latent}}
+        workflow[decode] = {"class_type": "VAEDecode", "inputs": {"samples": [sampler, 0], "vae": ["1", 2]}}
+        workflow[save] = {"class_type": "SaveImage", "inputs": {"filename_prefix": "bench", "images": [decode, 0]}}
+        latent = [sampler, 0]
+        node_id += 5
+    return workflow
+
+
+def make_history(entries, rng):
+    """A /history document with prompts, outputs and status messages."""
+    history = {}
+    for number in range(entries):
+        prompt_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        workflow = make_workflow(12, rng)
+        outputs = {
+            node_id: {"images": [{"filename": f"bench_{number:05d}_{i}_.png", "subfolder": "", "type": "output"}
+                                 for i in range(2)]}
+            for node_id, node in workflow.items() if node["class_type"] == "SaveImage"
+        }
+        history[prompt_id] = {
+            "prompt": [number, prompt_id, workflow, {"client_id": uuid.UUID(int=rng.getrandbits(128)).hex},
+                       list(outputs)],
+            "outputs": outputs,
+            "status": {"status_str": "success", "completed": True, "messages": [
+                ["execution_start", {"prompt_id": prompt_id, "timestamp": 1700000000000 + number}],
+                ["execution_cached", {"nodes": [], "prompt_id": prompt_id, "timestamp": 1700000000001 + number}],
+                ["execution_success", {"prompt_id": prompt_id, "timestamp": 1700000009000 + number}],
+            ]},
+            "meta": {node_id: {"node_id": node_id, "display_node": node_id, "parent_node": None,
+                               "real_node_id": node_id} for node_id in outputs},
+        }
+    return history
+
+
+def _best(func, repeat, number):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def _stream(data, chunk_size=65536):
+    parser = JsonObjectStream()
+    count = 0
+    for i in range(0, len(data), chunk_size):
+        count += len(parser.feed(data[i:i + chunk_size]))
+    return count + len(parser.close())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=400, help="Nodes in the benchmark workflow.")
+    parser.add_argument('--history', type=int, default=2000, help="Entries in the benchmark history.")
+    parser.add_argument('--repeat', type=int, default=5, help="Repetitions; the best one is reported.")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    workflow = {"prompt": make_workflow(args.nodes, rng)}
+    history = make_history(args.history, rng)
+    stdlib = get_codec('json')
+    workflow_bytes = stdlib.dumps(workflow)
+    history_bytes = stdlib.dumps(history)
+    print(f"workflow: {len(workflow['prompt'])} nodes, {len(workflow_bytes) / 1024:.0f} KiB")
+    print(f"history:  {len(history)} entries, {len(history_bytes) / 1024 / 1024:.1f} MiB")
+    print()
+
+    results = {}
+    print(f"{'codec':<10}{'encode workflow':>18}{'decode workflow':>18}{'decode history':>18}")
+    for name in available_codecs():
+        codec = get_codec(name)
+        timings = (
+            _best(lambda: codec.dumps(workflow), args.repeat, 20),
+            _best(lambda: codec.loads(workflow_bytes), args.repeat, 20),
+            _best(lambda: codec.loads(history_bytes), args.repeat, 1),
+        )
+        results[name] = timings
+        print(f"{name:<10}" + ''.join(f"{t * 1000:>15.2f} ms" for t in timings))
+
+    base = results['json']
+    print()
+    for name, timings in results.items():
+        if name != 'json':
+            speedups = ', '.join(f"{b / t:.1f}x" for b, t in zip(base, timings))
+            print(f"{name} speedup over json (encode, decode workflow, decode history): {speedups}")
+
+    stream_time = _best(lambda: _stream(history_bytes), args.repeat, 1)
+    print(f"\nstreaming history parse (iter_history): {stream_time * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
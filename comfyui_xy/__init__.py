@@ -1,3 +1,16 @@
-from .client import ComfyUiClient, AsyncComfyUiClient
+from .client import ComfyUiClient, AsyncComfyUiClient, create_session
+from .cache import ViewCache
+from .coordinator import Coordinator, CoordinatorClient
+from .errors import ComfyUiError, ComfyConnectionError, CircuitOpenError, ComfyHTTPError, ComfyTimeoutError
+from .fusion import FusionSubmitter
+from .preprocess import ImageTransform
+from .scheduling import AffinityScheduler
+from .storage import SpillStorage
+from .transport import RetryPolicy, CircuitBreaker
 
-__all__ = ['ComfyUiClient', 'AsyncComfyUiClient']
+__all__ = [
+    'ComfyUiClient', 'AsyncComfyUiClient', 'create_session', 'ViewCache', 'ImageTransform', 'SpillStorage',
+    'RetryPolicy', 'CircuitBreaker', 'FusionSubmitter', 'AffinityScheduler',
+    'Coordinator', 'CoordinatorClient',
+    'ComfyUiError', 'ComfyConnectionError', 'CircuitOpenError', 'ComfyHTTPError', 'ComfyTimeoutError',
+]
@@ -0,0 +1,260 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+
+
+class CacheEntry:
+    """A cached file and the validators the server sent with it."""
+
+    __slots__ = ('data', 'etag', 'last_modified', 'from_disk')
+
+    def __init__(self, data, etag=None, last_modified=None, from_disk=False):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        # Read back from the disk tier and not yet confirmed by the server
+        self.from_disk = from_disk
+
+    def conditional_headers(self):
+        """Headers for a conditional request revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ViewCache:
+    """
+    Local cache for files downloaded through `get_view`.
+
+    Entries are keyed by (server, filename, subfolder, type) and kept in an
+    in-memory LRU bounded by `max_bytes`, with an optional on-disk tier that
+    survives restarts.
+
+    ComfyUI numbers output files from the ones already on disk, so a filename
+    is reused with new content once the output directory has been cleaned up.
+    Entries read from the disk tier, which may predate such a cleanup, are
+    therefore revalidated with a conditional request (ETag/Last-Modified)
+    before they are served. Memory hits are served directly, except for the
+    types in `revalidate_types` (uploaded inputs, which can be overwritten at
+    any time); add 'output' for long-running processes whose server cleans up
+    its outputs.
+
+    A cache can be shared between clients and threads.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, directory=None, disk_max_bytes=None,
+                 include_temp=False, revalidate_types=('input',)):
+        """
+        Args:
+            max_bytes (int): Memory budget for cached file data.
+            directory (str, optional): Directory for the on-disk tier. Disabled if None.
+            disk_max_bytes (int, optional): Budget for the on-disk tier. Unbounded if None.
+            include_temp (bool): Also cache 'temp' files (previews). These are
+                overwritten by the server, so they are excluded by default.
+            revalidate_types (tuple): Folder types revalidated with the server on every hit.
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.include_temp = include_temp
+        self.revalidate_types = tuple(revalidate_types)
+        # Counted by `record` once a file is served from the cache or downloaded
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Bytes in the disk tier, counted on first use and then kept up to date
+        self._disk_size = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def size(self):
+        """Bytes of file data held in memory."""
+        return self._size
+
+    def cacheable(self, folder_type):
+        return self.include_temp or folder_type != 'temp'
+
+    def needs_revalidation(self, folder_type, entry=None):
+        return folder_type in self.revalidate_types or (entry is not None and entry.from_disk)
+
+    def revalidated(self, entry):
+        """Record that the server confirmed an entry is current."""
+        entry.from_disk = False
+
+    def record(self, hit):
+        """
+        Count a request for a file.
+
+        Args:
+            hit (bool): True if it was served from the cache (directly or after a
+                304), False if it was downloaded.
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_memory(self, key):
+        """
+        Look up a file in memory only. Never touches the disk, so it is safe to
+        call from an event loop.
+
+        Returns:
+            CacheEntry: The entry, or None if it is not in memory.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key):
+        """
+        Look up a file in memory, then on disk.
+
+        Returns:
+            CacheEntry: The entry, or None on a miss.
+        """
+        entry = self.get_memory(key)
+        if entry is not None:
+            return entry
+
+        entry = self._read_disk(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self._store_memory(key, entry)
+        return entry
+
+    def put(self, key, data, etag=None, last_modified=None):
+        """Store a downloaded file. Writes to the disk tier if there is one."""
+        entry = CacheEntry(data, etag, last_modified)
+        with self._lock:
+            self._store_memory(key, entry)
+        self._write_disk(key, entry)
+        return entry
+
+    def clear(self):
+        """Drop every entry from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        for path in self._disk_files():
+            _remove(path)
+            _remove(path[:-len('.bin')] + '.json')
+        self._disk_size = 0 if self.directory else None
+
+    def _store_memory(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old.data)
+        if len(entry.data) > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._size += len(entry.data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.data)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(json.dumps(list(key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def _disk_files(self):
+        if not self.directory:
+            return []
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if name.endswith('.bin')]
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(path + '.bin', 'rb') as f:
+                data = f.read()
+            # Touch the file so disk eviction is least-recently-used
+            os.utime(path + '.bin')
+        except (OSError, ValueError):
+            return None
+        if not meta.get('etag') and not meta.get('last_modified'):
+            # Cannot be revalidated, so it cannot be trusted
+            return None
+        return CacheEntry(data, meta.get('etag'), meta.get('last_modified'), from_disk=True)
+
+    def _write_disk(self, key, entry):
+        if not self.directory or not (entry.etag or entry.last_modified):
+            # Without validators a disk entry could never be revalidated
+            return
+        path = self._disk_path(key)
+        if self.disk_max_bytes is not None and self._disk_size is None:
+            self._disk_size = sum(size for size, _, _ in self._disk_stats())
+        try:
+            replaced = os.path.getsize(path + '.bin')
+        except OSError:
+            replaced = 0
+        try:
+            # Write the data first so a reader never sees metadata without data
+            _write_atomic(path + '.bin', entry.data)
+            meta = {'key': list(key), 'etag': entry.etag, 'last_modified': entry.last_modified}
+            _write_atomic(path + '.json', json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            print(f"Error writing cache file: {e}")
+            return
+        if self.disk_max_bytes is not None:
+            with self._lock:
+                self._disk_size += len(entry.data) - replaced
+                over = self._disk_size > self.disk_max_bytes
+            if over:
+                self._evict_disk()
+
+    def _disk_stats(self):
+        stats = []
+        for path in self._disk_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stats.append((stat.st_size, stat.st_mtime, path))
+        return stats
+
+    def _evict_disk(self):
+        # The directory is only listed when over budget. Evicting to 90% of it
+        # keeps that from happening again on the very next write.
+        files = sorted(self._disk_stats(), key=lambda stat: stat[1])
+        total = sum(size for size, _, _ in files)
+        target = self.disk_max_bytes * 0.9
+        while total > target and files:
+            size, _, path = files.pop(0)
+            _remove(path)
+            _remove(path[:-len('.bin')] + '.json')
+            total -= size
+        with self._lock:
+            # Recounted from the directory, which other processes may share
+            self._disk_size = total
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
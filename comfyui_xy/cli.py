@@ -0,0 +1,321 @@
+"""
+Command-line entry point for running a workflow over many inputs.
+
+Example:
+    comfyui-xy workflow_api.json --param 3.seed=1:101 --concurrency 4 -o out/
+    comfyui-xy workflow_api.json --inputs prompts.csv -o out/
+"""
+import argparse
+import asyncio
+import copy
+import csv
+import hashlib
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+from .client import AsyncComfyUiClient, _iter_output_files
+from .errors import ComfyUiError
+from .preprocess import ImageTransform
+from .storage import SpillStorage, SpilledFile
+
+MANIFEST_NAME = 'manifest.jsonl'
+
+_RANGE_RE = re.compile(r'^(-?\d+):(-?\d+)(?::(-?\d+))?$')
+
+
+def _parse_value(text):
+    """Decode a JSON scalar if possible, otherwise keep the raw string."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_param(spec):
+    """
+    Parse a ``--param`` specification.
+
+    ``NODE.INPUT=VALUES`` where VALUES is a JSON list, a ``start:stop[:step]``
+    integer range (stop exclusive, like ``range()``), or a single value.
+
+    Returns:
+        tuple: (key, list of values)
+    """
+    if '=' not in spec:
+        raise argparse.ArgumentTypeError(f"Expected NODE.INPUT=VALUES, got {spec!r}")
+    key, values = spec.split('=', 1)
+    if '.' not in key:
+        raise argparse.ArgumentTypeError(f"Expected NODE.INPUT before '=', got {key!r}")
+
+    match = _RANGE_RE.match(values)
+    if match:
+        start, stop, step = match.groups()
+        return key, list(range(int(start), int(stop), int(step or 1)))
+    if values.startswith('['):
+        try:
+            parsed = json.loads(values)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(f"Invalid JSON list for {key}: {e}")
+        return key, parsed
+    return key, [_parse_value(values)]
+
+
+def load_rows(path):
+    """
+    Load input rows from a CSV (header row of NODE.INPUT columns) or JSONL file.
+
+    Returns:
+        list[dict]: One mapping of NODE.INPUT -> value per row.
+    """
+    rows = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.jsonl'):
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(json.loads(line))
+        else:
+            for row in csv.DictReader(f):
+                rows.append({k: _parse_value(v) for k, v in row.items() if v != ''})
+    return rows
+
+
+def build_jobs(params, rows):
+    """
+    Expand the parameter grid and input rows into a list of jobs.
+
+    Every row is combined with every point of the grid (cartesian product).
+    """
+    keys = [key for key, _ in params]
+    grid = [dict(zip(keys, combo)) for combo in itertools.product(*[values for _, values in params])]
+    if not rows:
+        rows = [{}]
+
+    jobs = []
+    for row in rows:
+        for point in grid:
+            job = dict(row)
+            job.update(point)
+            jobs.append(job)
+    return jobs
+
+
+def workflow_fingerprint(workflow, url):
+    """Hash of the workflow and server, so a changed run does not resume from an old manifest."""
+    encoded = json.dumps([workflow, url], sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def job_key(job, fingerprint=None):
+    """
+    Stable identifier of a job, used to resume partial runs.
+
+    Args:
+        job (dict): The job parameters.
+        fingerprint (str, optional): `workflow_fingerprint` of the run.
+    """
+    encoded = json.dumps([fingerprint, job], sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def apply_job(workflow, job, uploads):
+    """Return a copy of the workflow with the job values set on the node inputs."""
+    workflow = copy.deepcopy(workflow)
+    for key, value in job.items():
+        node_id, input_name = key.split('.', 1)
+        if node_id not in workflow:
+            raise KeyError(f"Node {node_id!r} not found in workflow")
+        if isinstance(value, str) and value.startswith('@'):
+            value = uploads[value[1:]]
+        workflow[node_id].setdefault('inputs', {})[input_name] = value
+    return workflow
+
+
+def read_manifest(path):
+    """Return the keys of jobs already completed in a previous run."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)['key'])
+            except (ValueError, KeyError):
+                # Ignore a truncated last line from an interrupted run
+                continue
+    return done
+
+
+class Stats:
+    """Throughput and latency counters for the live progress line."""
+
+    def __init__(self, total, skipped):
+        self.total = total
+        self.skipped = skipped
+        self.completed = 0
+        self.failed = 0
+        self.files = 0
+        self.latencies = []
+        self.started = time.monotonic()
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    def line(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        done = self.completed + self.failed + self.skipped
+        return (f"{done}/{self.total} done ({self.skipped} skipped, {self.failed} failed) | "
+                f"{rate:.2f} jobs/s | {self.files} files | "
+                f"latency p50 {self.percentile(0.5):.1f}s p95 {self.percentile(0.95):.1f}s")
+
+
+async def _report(stats, interval, stream):
+    while True:
+        await asyncio.sleep(interval)
+        stream.write('\r' + stats.line())
+        stream.flush()
+
+
+def _save_output(file_data, path):
+    """Write a downloaded output to `path`. Blocking, so it is run in an executor."""
+    if isinstance(file_data, SpilledFile):
+        try:
+            file_data.save(path)
+        finally:
+            file_data.close()
+    else:
+        with open(path, 'wb') as f:
+            f.write(file_data)
+
+
+async def _run_job(client, workflow, index, job, args, stats, manifest):
+    # The client raises on errors; the caller counts the job as failed
+    key = job_key(job, args.fingerprint)
+    started = time.monotonic()
+
+    uploads = {}
+    for value in job.values():
+        if isinstance(value, str) and value.startswith('@') and value[1:] not in uploads:
+            uploads[value[1:]] = await client.upload_image(value[1:], transform=args.transform)
+
+    prompt_id = await client.queue_prompt(apply_job(workflow, job, uploads))
+    outputs = await client.wait_for_execution(prompt_id, check_interval=args.check_interval)
+
+    loop = asyncio.get_running_loop()
+    saved = []
+    previews = 0
+    for i, item in enumerate(_iter_output_files(outputs)):
+        if item['type'] == 'temp' and not args.include_temp:
+            previews += 1
+            continue
+        file_data = await client.get_view(item['filename'], item['subfolder'], item['type'], client.storage)
+        filename = f"{index:05d}_{key}_{i}_{item['filename']}"
+        await loop.run_in_executor(None, _save_output, file_data, os.path.join(args.output_dir, filename))
+        saved.append(filename)
+    if not saved:
+        # A failed node leaves no outputs; recording the job would skip it on every resume
+        hint = f" ({previews} previews skipped, see --include-temp)" if previews else ""
+        raise ComfyUiError(f"Prompt {prompt_id} produced no output files{hint}")
+
+    latency = time.monotonic() - started
+    stats.completed += 1
+    stats.files += len(saved)
+    stats.latencies.append(latency)
+    record = {'key': key, 'index': index, 'params': job, 'workflow': args.fingerprint, 'prompt_id': prompt_id,
+              'files': saved, 'latency': round(latency, 3)}
+    manifest.write(json.dumps(record, ensure_ascii=False) + '\n')
+    manifest.flush()
+
+
+async def run(args):
+    with open(args.workflow, 'r', encoding='utf-8') as f:
+        workflow = json.load(f)
+
+    rows = []
+    for path in args.inputs:
+        rows.extend(load_rows(path))
+    jobs = build_jobs(args.param, rows)
+    args.fingerprint = workflow_fingerprint(workflow, args.url)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    done = read_manifest(manifest_path) if args.resume else set()
+    pending = [(index, job) for index, job in enumerate(jobs) if job_key(job, args.fingerprint) not in done]
+
+    stats = Stats(len(jobs), len(jobs) - len(pending))
+    queue = asyncio.Queue()
+    for entry in pending:
+        queue.put_nowait(entry)
+
+    # Large outputs are streamed to a temp file next to their destination and hardlinked into place
+    storage = SpillStorage(directory=args.output_dir)
+    async with AsyncComfyUiClient(url=args.url, storage=storage, raise_errors=True) as client:
+        with open(manifest_path, 'a' if args.resume else 'w', encoding='utf-8') as manifest:
+            async def worker():
+                while not queue.empty():
+                    index, job = queue.get_nowait()
+                    try:
+                        await _run_job(client, workflow, index, job, args, stats, manifest)
+                    except Exception as e:
+                        stats.failed += 1
+                        print(f"\nJob {index} failed: {e}", file=sys.stderr)
+
+            reporter = asyncio.ensure_future(_report(stats, args.progress_interval, sys.stderr))
+            try:
+                await asyncio.gather(*[worker() for _ in range(max(1, args.concurrency))])
+            finally:
+                reporter.cancel()
+
+    sys.stderr.write('\r' + stats.line() + '\n')
+    return 1 if stats.failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='comfyui-xy',
+        description="Run a ComfyUI API-format workflow over a parameter grid or a file of inputs.",
+    )
+    parser.add_argument('workflow', help="Path to the workflow JSON (API format).")
+    parser.add_argument('--url', default='http://127.0.0.1:8188', help="ComfyUI server URL.")
+    parser.add_argument('-p', '--param', action='append', default=[], type=parse_param, metavar='NODE.INPUT=VALUES',
+                        help="Grid parameter: a JSON list, a start:stop[:step] range or a single value. "
+                             "String values starting with '@' are local image paths to upload. Repeatable.")
+    parser.add_argument('-i', '--inputs', action='append', default=[], metavar='FILE',
+                        help="CSV (NODE.INPUT header) or JSONL file with one job per row. Repeatable.")
+    parser.add_argument('-o', '--output-dir', default='comfyui_output', help="Directory to write outputs to.")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="Number of jobs in flight.")
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help="Run every job again instead of skipping those recorded in the manifest.")
+    parser.add_argument('--include-temp', action='store_true', help="Also save 'temp' outputs (previews).")
+    parser.add_argument('--upload-max-side', type=int, help="Downscale '@' images so the longest side fits before uploading.")
+    parser.add_argument('--upload-format', choices=['png', 'jpeg', 'webp'], help="Re-encode '@' images before uploading.")
+    parser.add_argument('--upload-quality', type=int, default=90, help="JPEG/WebP quality for re-encoded uploads.")
+    parser.add_argument('--check-interval', type=float, default=1, help="Seconds between completion checks.")
+    parser.add_argument('--progress-interval', type=float, default=1, help="Seconds between progress updates.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.transform = None
+    if args.upload_max_side or args.upload_format:
+        args.transform = ImageTransform(max_side=args.upload_max_side, format=args.upload_format,
+                                        quality=args.upload_quality)
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        sys.stderr.write("\nInterrupted, completed jobs are recorded in the manifest.\n")
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
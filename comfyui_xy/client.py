@@ -1,4 +1,3 @@
-import requests
 import time
 import io
 import random
@@ -6,17 +5,32 @@ import asyncio
 import aiohttp
 from PIL import Image
 
+from .history import JsonObjectStream, HistoryScan
+from .preprocess import read_upload
+from .storage import SpilledFile
+from .errors import ComfyUiError, ComfyConnectionError, ComfyHTTPError, ComfyTimeoutError
+from .frames import open_frames
+from .codec import get_codec
+from .transport import RetryPolicy, CircuitBreaker, SyncTransport, AsyncTransport
+
 class ComfyResponse:
     def __init__(self, data, filename, source_type):
-        self.data = data
+        # Large outputs may be spilled to disk (see SpillStorage); `data` is then
+        # a zero-copy memoryview of the memory-mapped temp file.
+        self._spilled = data if isinstance(data, SpilledFile) else None
+        self.data = data.buffer if self._spilled else data
         self.filename = filename
         self.source_type = source_type # 'output', 'temp', etc.
         self.file_type = self._determine_file_type()
         self.image = None
+        self._frames = None
         
         if self.file_type == 'image':
             try:
-                self.image = Image.open(io.BytesIO(data))
+                if self._spilled:
+                    self.image = Image.open(self._spilled.path)
+                else:
+                    self.image = Image.open(io.BytesIO(data))
             except Exception:
                 pass
 
@@ -34,6 +48,26 @@ class ComfyResponse:
             return 'audio'
         return 'unknown'
 
+    @property
+    def frames(self):
+        """
+        Lazy frame reader for video and animated image outputs.
+        
+        Frame count and fps come from the container header; frames are decoded
+        only when indexed or iterated, straight from the in-memory data or the
+        spilled file. Videos other than GIF/WebP/PNG require PyAV (`comfyui_xy[video]`).
+        
+        Returns:
+            FrameReader: Supports `len()`, `count`, `fps`, `frames[i]` and `iter_frames()`.
+            `count` is None if the container does not give it, and `len()` raises `TypeError`.
+        """
+        if self._frames is None:
+            if self.file_type not in ('video', 'image'):
+                raise ValueError(f"Cannot read frames of a non-video file: {self.filename}")
+            source = self._spilled.path if self._spilled else self.data
+            self._frames = open_frames(source, self.filename)
+        return self._frames
+
     def save(self, path=None):
         """
         Save the file to disk.
@@ -43,8 +77,25 @@ class ComfyResponse:
         """
         if path is None:
             path = self.filename
+        if self._spilled:
+            # Hardlink the temp file instead of copying it through memory
+            self._spilled.save(path)
+            return
         with open(path, 'wb') as f:
             f.write(self.data)
+
+    def close(self):
+        """
+        Release the frame reader and the temp file of a spilled response.
+        """
+        if self._frames:
+            self._frames.close()
+            self._frames = None
+        if self._spilled:
+            if self.image:
+                self.image.close()
+            self.data = None
+            self._spilled.close()
             
     def show(self):
         """
@@ -55,8 +106,45 @@ class ComfyResponse:
         else:
             print(f"Cannot show non-image file: {self.filename}")
 
+# Headers for request bodies encoded by the JSON codec
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Bytes read from the socket at a time when streaming a download
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def _history_params(max_items, offset):
+    """Build the query parameters for the /history endpoint."""
+    params = {}
+    if max_items is not None:
+        params['max_items'] = str(max_items)
+    if offset is not None:
+        params['offset'] = str(offset)
+    return params
+
+# Minimum seconds between /queue checks while a prompt is not in the history yet
+_QUEUE_CHECK_INTERVAL = 10
+
+def _queue_contains(queue, prompt_id):
+    """Whether a /queue response lists the prompt as running or pending."""
+    for item in queue.get('queue_running', []) + queue.get('queue_pending', []):
+        # Items are [number, prompt_id, prompt, extra_data, outputs_to_execute]
+        if len(item) > 1 and item[1] == prompt_id:
+            return True
+    return False
+
+def _iter_output_files(outputs):
+    """Yield the file entries (dicts with filename/subfolder/type) of execution outputs."""
+    for node_id, node_output in outputs.items():
+        # Iterate over all output types (images, gifs, videos, etc.)
+        for output_type, output_list in node_output.items():
+            if isinstance(output_list, list):
+                for item in output_list:
+                    if isinstance(item, dict) and 'filename' in item and 'subfolder' in item and 'type' in item:
+                        yield item
+
 class ComfyUiClient:
-    def __init__(self, url="http://127.0.0.1:8188", server_address=None, https=False):
+    def __init__(self, url="http://127.0.0.1:8188", server_address=None, https=False, cache=None, storage=None,
+                 retry=None, breaker=None, raise_errors=False, codec=None):
         """
         Initialize the ComfyUI client.
         
@@ -64,6 +152,15 @@ class ComfyUiClient:
             url (str): The full URL of the ComfyUI server (e.g., "http://127.0.0.1:8188").
             server_address (str, optional): Deprecated. Use `url` instead.
             https (bool, optional): Deprecated. Use `url` instead.
+            cache (ViewCache, optional): Local cache for files downloaded with `get_view`.
+            storage (SpillStorage, optional): Spill large outputs of `process_workflow` to disk.
+            retry (RetryPolicy, optional): How failed requests are retried. Defaults to `RetryPolicy()`.
+            breaker (CircuitBreaker, optional): Circuit breaker for the server. Defaults to the
+                breaker shared by all clients of the same URL.
+            raise_errors (bool): Raise `ComfyUiError` subclasses instead of printing errors and
+                returning None/{}.
+            codec (str | JsonCodec, optional): JSON codec for prompts and responses ("orjson",
+                "msgspec" or "json"). Defaults to the fastest installed one.
         """
         if server_address:
             # Backward compatibility
@@ -76,61 +173,75 @@ class ComfyUiClient:
                 url = f"http://{url}"
             self.base_url = url.rstrip("/")
 
-    def upload_image(self, image_path, overwrite=True):
+        self.cache = cache
+        self.storage = storage
+        self.raise_errors = raise_errors
+        self._codec = get_codec(codec)
+        if breaker is not None and breaker.name is None:
+            # Name a breaker built by the caller after its server, for error messages
+            breaker.name = self.base_url
+        self._transport = SyncTransport(retry or RetryPolicy(), breaker or CircuitBreaker.for_server(self.base_url))
+
+        # Prompt ID of the newest entry returned by iter_new_history
+        self.last_history_id = None
+
+    def _request(self, method, url, idempotent=True, **kwargs):
+        return self._transport.request(method, url, idempotent=idempotent, **kwargs)
+
+    def _handle_error(self, action, error, default):
+        """Raise `error` if `raise_errors` is set, otherwise log it and return `default`."""
+        if self.raise_errors:
+            raise error
+        print(f"Error {action}: {error}")
+        return default
+
+    def upload_image(self, image_path, overwrite=True, transform=None):
         """
         Upload an image to the ComfyUI server.
         
         Args:
             image_path (str): Path to the image file.
             overwrite (bool): Whether to overwrite existing files.
+            transform (ImageTransform, optional): Resize/re-encode the image before uploading.
             
         Returns:
             str: The name of the uploaded file on the server, or None if failed.
         """
         url = f"{self.base_url}/upload/image"
         try:
-            with open(image_path, 'rb') as f:
-                files = {'image': f}
-                data = {'type': 'input', 'overwrite': str(overwrite).lower()}
-                response = requests.post(url, files=files, data=data)
-                
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('name')
-            else:
-                print(f"Failed to upload image: {response.status_code} {response.text}")
-                return None
+            file_data, filename = read_upload(image_path, transform)
+            files = {'image': (filename, file_data)}
+            data = {'type': 'input', 'overwrite': str(overwrite).lower()}
+            # Re-sending the same upload is only harmless when it overwrites
+            response = self._request('POST', url, idempotent=overwrite, files=files, data=data)
+            result = self._codec.loads(response.content)
+            return result.get('name')
         except Exception as e:
-            print(f"Error uploading image: {e}")
-            return None
+            return self._handle_error("uploading image", e, None)
 
-    def upload_mask(self, mask_path, overwrite=True):
+    def upload_mask(self, mask_path, overwrite=True, transform=None):
         """
         Upload a mask to the ComfyUI server.
         
         Args:
             mask_path (str): Path to the mask file.
             overwrite (bool): Whether to overwrite existing files.
+            transform (ImageTransform, optional): Resize/re-encode the mask before uploading.
             
         Returns:
             str: The name of the uploaded mask file on the server, or None if failed.
         """
         url = f"{self.base_url}/upload/mask"
         try:
-            with open(mask_path, 'rb') as f:
-                files = {'image': f}
-                data = {'type': 'input', 'overwrite': str(overwrite).lower()}
-                response = requests.post(url, files=files, data=data)
-                
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('name')
-            else:
-                print(f"Failed to upload mask: {response.status_code} {response.text}")
-                return None
+            file_data, filename = read_upload(mask_path, transform)
+            files = {'image': (filename, file_data)}
+            data = {'type': 'input', 'overwrite': str(overwrite).lower()}
+            # Re-sending the same upload is only harmless when it overwrites
+            response = self._request('POST', url, idempotent=overwrite, files=files, data=data)
+            result = self._codec.loads(response.content)
+            return result.get('name')
         except Exception as e:
-            print(f"Error uploading mask: {e}")
-            return None
+            return self._handle_error("uploading mask", e, None)
 
     def interrupt(self):
         """
@@ -141,11 +252,10 @@ class ComfyUiClient:
         """
         url = f"{self.base_url}/interrupt"
         try:
-            response = requests.post(url)
-            return response.status_code == 200
+            self._request('POST', url)
+            return True
         except Exception as e:
-            print(f"Error interrupting execution: {e}")
-            return False
+            return self._handle_error("interrupting execution", e, False)
 
     def get_object_info(self, node_class):
         """
@@ -159,32 +269,105 @@ class ComfyUiClient:
         """
         url = f"{self.base_url}/object_info/{node_class}"
         try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Failed to get object info: {response.status_code} {response.text}")
-                return None
+            response = self._request('GET', url)
+            return self._codec.loads(response.content)
         except Exception as e:
-            print(f"Error getting object info: {e}")
-            return None
+            return self._handle_error("getting object info", e, None)
 
-    def get_history_all(self):
+    def get_history_all(self, max_items=None, offset=None):
         """
         Get the entire history.
         
+        Args:
+            max_items (int, optional): Only return the newest `max_items` entries.
+            offset (int, optional): Index of the first entry to return.
+            
         Returns:
             dict: The history data.
         """
         url = f"{self.base_url}/history"
+        params = _history_params(max_items, offset)
+        try:
+            response = self._request('GET', url, params=params)
+            return self._codec.loads(response.content)
+        except Exception as e:
+            return self._handle_error("getting history", e, {})
+
+    def iter_history(self, max_items=None, offset=None, chunk_size=65536):
+        """
+        Stream history entries without loading the whole document.
+        
+        The response is parsed incrementally, so only one entry is held
+        in memory at a time.
+        
+        Args:
+            max_items (int, optional): Only return the newest `max_items` entries.
+            offset (int, optional): Index of the first entry to return.
+            chunk_size (int): Bytes to read from the socket at a time.
+            
+        Yields:
+            tuple: (prompt_id, entry) pairs, oldest first.
+        """
+        try:
+            yield from self._iter_history(max_items, offset, chunk_size)
+        except Exception as e:
+            self._handle_error("getting history", e, None)
+
+    def _iter_history(self, max_items=None, offset=None, chunk_size=65536):
+        # Like iter_history, but errors propagate: a stream cut off mid-way
+        # must not pass for a short, complete page.
+        url = f"{self.base_url}/history"
+        params = _history_params(max_items, offset)
+        with self._request('GET', url, params=params, stream=True) as response:
+            parser = JsonObjectStream()
+            for chunk in response.iter_content(chunk_size):
+                yield from parser.feed(chunk)
+            yield from parser.close()
+
+    def iter_new_history(self, since=None, page_size=64, chunk_size=65536):
+        """
+        Yield only the history entries added after the last seen prompt.
+        
+        Pages of `page_size` entries are requested with `max_items`, doubling
+        until the last seen prompt is found, so the amount of JSON fetched is
+        proportional to what changed rather than to the total history size.
+        The newest yielded prompt ID is stored in `last_history_id` and used
+        as the starting point of the next call. If a page cannot be read in
+        full, nothing is yielded and `last_history_id` is left unchanged.
+        
+        Args:
+            since (str, optional): Prompt ID to start after. Defaults to `last_history_id`.
+                If neither is set, the whole history is yielded.
+            page_size (int): Number of entries requested in the first page.
+            chunk_size (int): Bytes to read from the socket at a time.
+            
+        Yields:
+            tuple: (prompt_id, entry) pairs, oldest first.
+        """
+        if since is None:
+            since = self.last_history_id
+        if since is None:
+            for prompt_id, entry in self.iter_history(chunk_size=chunk_size):
+                self.last_history_id = prompt_id
+                yield prompt_id, entry
+            return
+
+        max_items = page_size
         try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                return response.json()
-            return {}
+            while True:
+                scan = HistoryScan(since)
+                for prompt_id, entry in self._iter_history(max_items=max_items, chunk_size=chunk_size):
+                    scan.add(prompt_id, entry)
+                if scan.is_complete(max_items):
+                    break
+                max_items *= 2
         except Exception as e:
-            print(f"Error getting history: {e}")
-            return {}
+            self._handle_error("getting history", e, None)
+            return
+
+        for prompt_id, entry in scan.entries:
+            self.last_history_id = prompt_id
+            yield prompt_id, entry
 
     def get_queue(self):
         """
@@ -195,13 +378,10 @@ class ComfyUiClient:
         """
         url = f"{self.base_url}/queue"
         try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                return response.json()
-            return {}
+            response = self._request('GET', url)
+            return self._codec.loads(response.content)
         except Exception as e:
-            print(f"Error getting queue: {e}")
-            return {}
+            return self._handle_error("getting queue", e, {})
 
 
     def queue_prompt(self, workflow):
@@ -217,16 +397,12 @@ class ComfyUiClient:
         url = f"{self.base_url}/prompt"
         data = {"prompt": workflow}
         try:
-            response = requests.post(url, json=data)
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('prompt_id')
-            else:
-                print(f"Failed to queue prompt: {response.status_code} {response.text}")
-                return None
+            response = self._request('POST', url, idempotent=False, data=self._codec.dumps(data),
+                                     headers=_JSON_HEADERS)
+            result = self._codec.loads(response.content)
+            return result.get('prompt_id')
         except Exception as e:
-            print(f"Error queuing prompt: {e}")
-            return None
+            return self._handle_error("queuing prompt", e, None)
 
     def get_history(self, prompt_id):
         """
@@ -240,15 +416,41 @@ class ComfyUiClient:
         """
         url = f"{self.base_url}/history/{prompt_id}"
         try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                return response.json()
-            return {}
+            response = self._request('GET', url)
+            return self._codec.loads(response.content)
         except Exception as e:
-            print(f"Error getting history: {e}")
-            return {}
+            return self._handle_error("getting history", e, {})
 
-    def get_view(self, filename, subfolder, folder_type):
+    def _cache_lookup(self, filename, subfolder, folder_type):
+        """
+        Look up a file in the view cache.
+        
+        Returns:
+            tuple: (entry, headers). A hit with empty headers can be served without a
+            request; otherwise the headers make the request conditional.
+        """
+        if self.cache is None or not self.cache.cacheable(folder_type):
+            return None, {}
+        entry = self.cache.get((self.base_url, filename, subfolder, folder_type))
+        if entry is None or not self.cache.needs_revalidation(folder_type, entry):
+            return entry, {}
+        headers = entry.conditional_headers()
+        if not headers:
+            # Nothing to revalidate with, fetch the file again
+            return None, {}
+        return entry, headers
+
+    def _cache_record(self, folder_type, hit):
+        if self.cache is not None and self.cache.cacheable(folder_type):
+            self.cache.record(hit)
+
+    def _cache_store(self, filename, subfolder, folder_type, file_data, response_headers):
+        if self.cache is None or not self.cache.cacheable(folder_type):
+            return
+        self.cache.put((self.base_url, filename, subfolder, folder_type), file_data,
+                       response_headers.get('ETag'), response_headers.get('Last-Modified'))
+
+    def get_view(self, filename, subfolder, folder_type, storage=None):
         """
         Download a file from the server (view endpoint).
         
@@ -256,9 +458,12 @@ class ComfyUiClient:
             filename (str): The filename.
             subfolder (str): The subfolder.
             folder_type (str): The folder type (e.g., "output").
+            storage (SpillStorage, optional): Stream the download into this storage, so
+                large files are spilled to disk instead of held in memory.
             
         Returns:
-            bytes: The file data.
+            bytes | SpilledFile: The file data (a `SpilledFile` only when spilled to
+            `storage`), or None if failed.
         """
         url = f"{self.base_url}/view"
         params = {
@@ -266,12 +471,32 @@ class ComfyUiClient:
             "subfolder": subfolder,
             "type": folder_type
         }
+        entry, headers = self._cache_lookup(filename, subfolder, folder_type)
+        if entry is not None and not headers:
+            self._cache_record(folder_type, True)
+            return entry.data
+        writer = None
         try:
-            response = requests.get(url, params=params)
-            return response.content
+            with self._request('GET', url, params=params, headers=headers, stream=storage is not None) as response:
+                if entry is not None and response.status_code == 304:
+                    self.cache.revalidated(entry)
+                    self._cache_record(folder_type, True)
+                    return entry.data
+                self._cache_record(folder_type, False)
+                if storage is None:
+                    file_data = response.content
+                else:
+                    writer = storage.writer(response.headers.get('Content-Length'))
+                    for chunk in response.iter_content(_DOWNLOAD_CHUNK_SIZE):
+                        writer.write(chunk)
+                    file_data = writer.finish()
+                if response.status_code == 200 and isinstance(file_data, bytes):
+                    self._cache_store(filename, subfolder, folder_type, file_data, response.headers)
+                return file_data
         except Exception as e:
-            print(f"Error getting file: {e}")
-            return None
+            if writer is not None:
+                writer.abort()
+            return self._handle_error("getting file", e, None)
 
     def get_image(self, filename, subfolder, folder_type):
         """
@@ -279,22 +504,69 @@ class ComfyUiClient:
         """
         return self.get_view(filename, subfolder, folder_type)
 
-    def wait_for_execution(self, prompt_id, check_interval=1):
+    def wait_for_execution(self, prompt_id, check_interval=1, timeout=None):
         """
         Wait for a prompt execution to complete.
         
+        Connection errors and retryable HTTP statuses (e.g. a proxy's 502 while the
+        server restarts) are waited out. While the prompt is not in the history, the
+        queue is checked too: a prompt that is neither running nor pending was lost
+        (a restart clears the queue) and fails with `ComfyUiError` instead of waiting
+        forever.
+        
         Args:
             prompt_id (str): The prompt ID.
             check_interval (int): Seconds to wait between checks.
+            timeout (float, optional): Give up after this many seconds.
             
         Returns:
             dict: The output data from history.
         """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        next_queue_check = 0
         while True:
-            history = self.get_history(prompt_id)
-            if prompt_id in history:
-                return history[prompt_id].get('outputs', {})
-            time.sleep(check_interval)
+            delay = check_interval
+            try:
+                outputs = self._history_outputs(prompt_id)
+                if outputs is not None:
+                    return outputs
+                if time.monotonic() >= next_queue_check:
+                    next_queue_check = time.monotonic() + _QUEUE_CHECK_INTERVAL
+                    response = self._request('GET', f"{self.base_url}/queue")
+                    if not _queue_contains(self._codec.loads(response.content), prompt_id):
+                        # It may have finished between the two requests
+                        outputs = self._history_outputs(prompt_id)
+                        if outputs is not None:
+                            return outputs
+                        error = ComfyUiError(f"Prompt {prompt_id} is neither queued nor in the history; "
+                                             "it was lost, e.g. because the server restarted")
+                        return self._handle_error("waiting for execution", error, {})
+            except (ComfyConnectionError, ComfyHTTPError) as e:
+                if isinstance(e, ComfyHTTPError) and e.status not in self._transport.retry.retry_statuses:
+                    return self._handle_error("waiting for execution", e, {})
+                # The server (or a proxy in front of it) may be restarting: keep waiting,
+                # but not faster than the circuit breaker lets requests through
+                print(f"Error waiting for execution: {e}")
+                delay = max(check_interval, self._transport.breaker.retry_after())
+                # A restart loses the queue, so check it as soon as the server is back
+                next_queue_check = 0
+            except Exception as e:
+                return self._handle_error("waiting for execution", e, {})
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    error = ComfyTimeoutError(f"Prompt {prompt_id} did not finish within {timeout}s")
+                    return self._handle_error("waiting for execution", error, {})
+                delay = min(delay, remaining)
+            time.sleep(delay)
+
+    def _history_outputs(self, prompt_id):
+        """Outputs of a finished prompt, or None if it is not in the history yet."""
+        response = self._request('GET', f"{self.base_url}/history/{prompt_id}")
+        history = self._codec.loads(response.content)
+        if prompt_id in history:
+            return history[prompt_id].get('outputs', {})
+        return None
 
     def process_workflow(self, workflow):
         """
@@ -316,24 +588,65 @@ class ComfyUiClient:
         outputs = self.wait_for_execution(prompt_id)
 
         # 3. Retrieve Files
+        return self._fetch_outputs(outputs)
+
+    def _fetch_outputs(self, outputs):
+        """
+        Download every file listed in execution outputs.
+        
+        Returns:
+            list[ComfyResponse]: The downloaded files.
+        """
         generated_files = []
-        for node_id, node_output in outputs.items():
-            # Iterate over all output types (images, gifs, videos, etc.)
-            for output_type, output_list in node_output.items():
-                if isinstance(output_list, list):
-                    for item in output_list:
-                        if isinstance(item, dict) and 'filename' in item and 'subfolder' in item and 'type' in item:
-                            file_data = self.get_view(item['filename'], item['subfolder'], item['type'])
-                            if file_data:
-                                response = ComfyResponse(file_data, item['filename'], item['type'])
-                                generated_files.append(response)
+        for item in _iter_output_files(outputs):
+            file_data = self.get_view(item['filename'], item['subfolder'], item['type'], self.storage)
+            if file_data:
+                response = ComfyResponse(file_data, item['filename'], item['type'])
+                generated_files.append(response)
         
         return generated_files
 
 
 
+def create_session(limit=100, limit_per_host=0, keepalive_timeout=15, ttl_dns_cache=10,
+                   use_dns_cache=True, timeout=None, connect_timeout=None):
+    """
+    Create an aiohttp session with tuned connection pooling.
+    
+    The returned session can be passed to any number of `AsyncComfyUiClient`
+    instances through `session=` so they share one connection pool. The caller
+    owns it and must close it. Call this from inside a running event loop.
+    
+    Args:
+        limit (int): Maximum number of open connections in total (0 for no limit).
+        limit_per_host (int): Maximum number of open connections per server (0 for no limit).
+        keepalive_timeout (float): Seconds an idle connection is kept for reuse.
+        ttl_dns_cache (float, optional): Seconds DNS results are cached (None caches forever).
+        use_dns_cache (bool): Whether to cache DNS lookups at all.
+        timeout (float, optional): Total timeout of a request in seconds.
+        connect_timeout (float, optional): Timeout for acquiring a connection in seconds.
+            If neither timeout is set, aiohttp's defaults are used.
+        
+    Returns:
+        aiohttp.ClientSession: The new session.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        ttl_dns_cache=ttl_dns_cache,
+        use_dns_cache=use_dns_cache,
+    )
+    kwargs = {}
+    if timeout is not None or connect_timeout is not None:
+        kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+    return aiohttp.ClientSession(connector=connector, **kwargs)
+
 class AsyncComfyUiClient:
-    def __init__(self, url="http://127.0.0.1:8188", server_address=None, https=False):
+    def __init__(self, url="http://127.0.0.1:8188", server_address=None, https=False, cache=None, storage=None,
+                 retry=None, breaker=None, raise_errors=False, codec=None, session=None,
+                 limit=100, limit_per_host=0, keepalive_timeout=15, ttl_dns_cache=10, use_dns_cache=True,
+                 timeout=None, connect_timeout=None):
         """
         Initialize the Async ComfyUI client.
         
@@ -341,6 +654,20 @@ class AsyncComfyUiClient:
             url (str): The full URL of the ComfyUI server (e.g., "http://127.0.0.1:8188").
             server_address (str, optional): Deprecated. Use `url` instead.
             https (bool, optional): Deprecated. Use `url` instead.
+            cache (ViewCache, optional): Local cache for files downloaded with `get_view`.
+            storage (SpillStorage, optional): Spill large outputs of `process_workflow` to disk.
+            retry (RetryPolicy, optional): How failed requests are retried. Defaults to `RetryPolicy()`.
+            breaker (CircuitBreaker, optional): Circuit breaker for the server. Defaults to the
+                breaker shared by all clients of the same URL.
+            raise_errors (bool): Raise `ComfyUiError` subclasses instead of printing errors and
+                returning None/{}.
+            codec (str | JsonCodec, optional): JSON codec for prompts and responses ("orjson",
+                "msgspec" or "json"). Defaults to the fastest installed one.
+            session (aiohttp.ClientSession, optional): A session to share with other clients
+                (see `create_session`). It is not closed by `close()`.
+            limit, limit_per_host, keepalive_timeout, ttl_dns_cache, use_dns_cache, timeout, connect_timeout:
+                Connection pool settings used when the client creates its own session.
+                See `create_session`.
         """
         if server_address:
             # Backward compatibility
@@ -353,15 +680,38 @@ class AsyncComfyUiClient:
                 url = f"http://{url}"
             self.base_url = url.rstrip("/")
         
-        self._session = None
+        self.cache = cache
+        self.storage = storage
+        self.raise_errors = raise_errors
+        self._codec = get_codec(codec)
+        if breaker is not None and breaker.name is None:
+            # Name a breaker built by the caller after its server, for error messages
+            breaker.name = self.base_url
+        self._transport = AsyncTransport(retry or RetryPolicy(), breaker or CircuitBreaker.for_server(self.base_url))
+        self._session = session
+        self._owns_session = session is None
+        self._session_options = {
+            'limit': limit,
+            'limit_per_host': limit_per_host,
+            'keepalive_timeout': keepalive_timeout,
+            'ttl_dns_cache': ttl_dns_cache,
+            'use_dns_cache': use_dns_cache,
+            'timeout': timeout,
+            'connect_timeout': connect_timeout,
+        }
+
+        # Prompt ID of the newest entry returned by iter_new_history
+        self.last_history_id = None
 
     async def _get_session(self):
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+        # Check and creation run without awaiting, so concurrent first calls
+        # on the event loop cannot create two sessions.
+        if self._owns_session and (self._session is None or self._session.closed):
+            self._session = create_session(**self._session_options)
         return self._session
 
     async def close(self):
-        if self._session and not self._session.closed:
+        if self._owns_session and self._session and not self._session.closed:
             await self._session.close()
 
     async def __aenter__(self):
@@ -370,73 +720,80 @@ class AsyncComfyUiClient:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
 
-    async def upload_image(self, image_path, overwrite=True):
+    async def _request(self, method, url, idempotent=True, **kwargs):
+        session = await self._get_session()
+        return await self._transport.request(session, method, url, idempotent=idempotent, **kwargs)
+
+    def _handle_error(self, action, error, default):
+        """Raise `error` if `raise_errors` is set, otherwise log it and return `default`."""
+        if self.raise_errors:
+            raise error
+        print(f"Error {action}: {error}")
+        return default
+
+    async def upload_image(self, image_path, overwrite=True, transform=None, executor=None):
         """
         Upload an image to the ComfyUI server.
         
         Args:
             image_path (str): Path to the image file.
             overwrite (bool): Whether to overwrite existing files.
+            transform (ImageTransform, optional): Resize/re-encode the image before uploading.
+            executor (concurrent.futures.Executor, optional): Pool that reads and transforms
+                the file off the event loop. Defaults to the loop's default executor.
             
         Returns:
             str: The name of the uploaded file on the server, or None if failed.
         """
         url = f"{self.base_url}/upload/image"
         try:
-            session = await self._get_session()
-            with open(image_path, 'rb') as f:
-                file_data = f.read()
+            loop = asyncio.get_running_loop()
+            file_data, filename = await loop.run_in_executor(executor, read_upload, image_path, transform)
             
             data = aiohttp.FormData()
-            data.add_field('image', file_data, filename=image_path.split('/')[-1].split('\\')[-1])
+            data.add_field('image', file_data, filename=filename)
             data.add_field('type', 'input')
             data.add_field('overwrite', str(overwrite).lower())
             
-            async with session.post(url, data=data) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result.get('name')
-                else:
-                    text = await response.text()
-                    print(f"Failed to upload image: {response.status} {text}")
-                    return None
+            # Re-sending the same upload is only harmless when it overwrites
+            response = await self._request('POST', url, idempotent=overwrite, data=data)
+            async with response:
+                result = self._codec.loads(await response.read())
+                return result.get('name')
         except Exception as e:
-            print(f"Error uploading image: {e}")
-            return None
+            return self._handle_error("uploading image", e, None)
 
-    async def upload_mask(self, mask_path, overwrite=True):
+    async def upload_mask(self, mask_path, overwrite=True, transform=None, executor=None):
         """
         Upload a mask to the ComfyUI server.
         
         Args:
             mask_path (str): Path to the mask file.
             overwrite (bool): Whether to overwrite existing files.
+            transform (ImageTransform, optional): Resize/re-encode the mask before uploading.
+            executor (concurrent.futures.Executor, optional): Pool that reads and transforms
+                the file off the event loop. Defaults to the loop's default executor.
             
         Returns:
             str: The name of the uploaded mask file on the server, or None if failed.
         """
         url = f"{self.base_url}/upload/mask"
         try:
-            session = await self._get_session()
-            with open(mask_path, 'rb') as f:
-                file_data = f.read()
-                
+            loop = asyncio.get_running_loop()
+            file_data, filename = await loop.run_in_executor(executor, read_upload, mask_path, transform)
+            
             data = aiohttp.FormData()
-            data.add_field('image', file_data, filename=mask_path.split('/')[-1].split('\\')[-1])
+            data.add_field('image', file_data, filename=filename)
             data.add_field('type', 'input')
             data.add_field('overwrite', str(overwrite).lower())
             
-            async with session.post(url, data=data) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result.get('name')
-                else:
-                    text = await response.text()
-                    print(f"Failed to upload mask: {response.status} {text}")
-                    return None
+            # Re-sending the same upload is only harmless when it overwrites
+            response = await self._request('POST', url, idempotent=overwrite, data=data)
+            async with response:
+                result = self._codec.loads(await response.read())
+                return result.get('name')
         except Exception as e:
-            print(f"Error uploading mask: {e}")
-            return None
+            return self._handle_error("uploading mask", e, None)
 
     async def interrupt(self):
         """
@@ -447,12 +804,11 @@ class AsyncComfyUiClient:
         """
         url = f"{self.base_url}/interrupt"
         try:
-            session = await self._get_session()
-            async with session.post(url) as response:
-                return response.status == 200
+            response = await self._request('POST', url)
+            async with response:
+                return True
         except Exception as e:
-            print(f"Error interrupting execution: {e}")
-            return False
+            return self._handle_error("interrupting execution", e, False)
 
     async def get_object_info(self, node_class):
         """
@@ -466,35 +822,111 @@ class AsyncComfyUiClient:
         """
         url = f"{self.base_url}/object_info/{node_class}"
         try:
-            session = await self._get_session()
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    text = await response.text()
-                    print(f"Failed to get object info: {response.status} {text}")
-                    return None
+            response = await self._request('GET', url)
+            async with response:
+                return self._codec.loads(await response.read())
         except Exception as e:
-            print(f"Error getting object info: {e}")
-            return None
+            return self._handle_error("getting object info", e, None)
 
-    async def get_history_all(self):
+    async def get_history_all(self, max_items=None, offset=None):
         """
         Get the entire history.
         
+        Args:
+            max_items (int, optional): Only return the newest `max_items` entries.
+            offset (int, optional): Index of the first entry to return.
+            
         Returns:
             dict: The history data.
         """
         url = f"{self.base_url}/history"
+        params = _history_params(max_items, offset)
         try:
-            session = await self._get_session()
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.json()
-                return {}
+            response = await self._request('GET', url, params=params)
+            async with response:
+                return self._codec.loads(await response.read())
         except Exception as e:
-            print(f"Error getting history: {e}")
-            return {}
+            return self._handle_error("getting history", e, {})
+
+    async def iter_history(self, max_items=None, offset=None, chunk_size=65536):
+        """
+        Stream history entries without loading the whole document.
+        
+        The response is parsed incrementally, so only one entry is held
+        in memory at a time.
+        
+        Args:
+            max_items (int, optional): Only return the newest `max_items` entries.
+            offset (int, optional): Index of the first entry to return.
+            chunk_size (int): Bytes to read from the socket at a time.
+            
+        Yields:
+            tuple: (prompt_id, entry) pairs, oldest first.
+        """
+        try:
+            async for item in self._iter_history(max_items, offset, chunk_size):
+                yield item
+        except Exception as e:
+            self._handle_error("getting history", e, None)
+
+    async def _iter_history(self, max_items=None, offset=None, chunk_size=65536):
+        # Like iter_history, but errors propagate: a stream cut off mid-way
+        # must not pass for a short, complete page.
+        url = f"{self.base_url}/history"
+        params = _history_params(max_items, offset)
+        response = await self._request('GET', url, params=params)
+        async with response:
+            parser = JsonObjectStream()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                for item in parser.feed(chunk):
+                    yield item
+            for item in parser.close():
+                yield item
+
+    async def iter_new_history(self, since=None, page_size=64, chunk_size=65536):
+        """
+        Yield only the history entries added after the last seen prompt.
+        
+        Pages of `page_size` entries are requested with `max_items`, doubling
+        until the last seen prompt is found, so the amount of JSON fetched is
+        proportional to what changed rather than to the total history size.
+        The newest yielded prompt ID is stored in `last_history_id` and used
+        as the starting point of the next call. If a page cannot be read in
+        full, nothing is yielded and `last_history_id` is left unchanged.
+        
+        Args:
+            since (str, optional): Prompt ID to start after. Defaults to `last_history_id`.
+                If neither is set, the whole history is yielded.
+            page_size (int): Number of entries requested in the first page.
+            chunk_size (int): Bytes to read from the socket at a time.
+            
+        Yields:
+            tuple: (prompt_id, entry) pairs, oldest first.
+        """
+        if since is None:
+            since = self.last_history_id
+        if since is None:
+            async for prompt_id, entry in self.iter_history(chunk_size=chunk_size):
+                self.last_history_id = prompt_id
+                yield prompt_id, entry
+            return
+
+        max_items = page_size
+        try:
+            while True:
+                scan = HistoryScan(since)
+                async for prompt_id, entry in self._iter_history(max_items=max_items, chunk_size=chunk_size):
+                    scan.add(prompt_id, entry)
+                if scan.is_complete(max_items):
+                    break
+                max_items *= 2
+        except Exception as e:
+            self._handle_error("getting history", e, None)
+            return
+
+        for prompt_id, entry in scan.entries:
+            self.last_history_id = prompt_id
+            yield prompt_id, entry
 
     async def get_queue(self):
         """
@@ -505,14 +937,11 @@ class AsyncComfyUiClient:
         """
         url = f"{self.base_url}/queue"
         try:
-            session = await self._get_session()
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.json()
-                return {}
+            response = await self._request('GET', url)
+            async with response:
+                return self._codec.loads(await response.read())
         except Exception as e:
-            print(f"Error getting queue: {e}")
-            return {}
+            return self._handle_error("getting queue", e, {})
 
     async def queue_prompt(self, workflow):
         """
@@ -527,18 +956,13 @@ class AsyncComfyUiClient:
         url = f"{self.base_url}/prompt"
         data = {"prompt": workflow}
         try:
-            session = await self._get_session()
-            async with session.post(url, json=data) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result.get('prompt_id')
-                else:
-                    text = await response.text()
-                    print(f"Failed to queue prompt: {response.status} {text}")
-                    return None
+            response = await self._request('POST', url, idempotent=False, data=self._codec.dumps(data),
+                                           headers=_JSON_HEADERS)
+            async with response:
+                result = self._codec.loads(await response.read())
+                return result.get('prompt_id')
         except Exception as e:
-            print(f"Error queuing prompt: {e}")
-            return None
+            return self._handle_error("queuing prompt", e, None)
 
     async def get_history(self, prompt_id):
         """
@@ -552,16 +976,52 @@ class AsyncComfyUiClient:
         """
         url = f"{self.base_url}/history/{prompt_id}"
         try:
-            session = await self._get_session()
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.json()
-                return {}
+            response = await self._request('GET', url)
+            async with response:
+                return self._codec.loads(await response.read())
         except Exception as e:
-            print(f"Error getting history: {e}")
-            return {}
+            return self._handle_error("getting history", e, {})
 
-    async def get_view(self, filename, subfolder, folder_type):
+    async def _cache_call(self, func, *args):
+        """Run a cache operation, in a thread when it reads or writes the disk tier."""
+        if not self.cache.directory:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _cache_lookup(self, filename, subfolder, folder_type):
+        """
+        Look up a file in the view cache.
+        
+        Returns:
+            tuple: (entry, headers). A hit with empty headers can be served without a
+            request; otherwise the headers make the request conditional.
+        """
+        if self.cache is None or not self.cache.cacheable(folder_type):
+            return None, {}
+        key = (self.base_url, filename, subfolder, folder_type)
+        entry = self.cache.get_memory(key)
+        if entry is None:
+            entry = await self._cache_call(self.cache.get, key)
+        if entry is None or not self.cache.needs_revalidation(folder_type, entry):
+            return entry, {}
+        headers = entry.conditional_headers()
+        if not headers:
+            # Nothing to revalidate with, fetch the file again
+            return None, {}
+        return entry, headers
+
+    def _cache_record(self, folder_type, hit):
+        if self.cache is not None and self.cache.cacheable(folder_type):
+            self.cache.record(hit)
+
+    async def _cache_store(self, filename, subfolder, folder_type, file_data, response_headers):
+        if self.cache is None or not self.cache.cacheable(folder_type):
+            return
+        await self._cache_call(self.cache.put, (self.base_url, filename, subfolder, folder_type), file_data,
+                               response_headers.get('ETag'), response_headers.get('Last-Modified'))
+
+    async def get_view(self, filename, subfolder, folder_type, storage=None):
         """
         Download a file from the server (view endpoint).
         
@@ -569,9 +1029,13 @@ class AsyncComfyUiClient:
             filename (str): The filename.
             subfolder (str): The subfolder.
             folder_type (str): The folder type (e.g., "output").
+            storage (SpillStorage, optional): Stream the download into this storage, so
+                large files are spilled to disk instead of held in memory. Writes to
+                the storage run in the default executor, off the event loop.
             
         Returns:
-            bytes: The file data.
+            bytes | SpilledFile: The file data (a `SpilledFile` only when spilled to
+            `storage`), or None if failed.
         """
         url = f"{self.base_url}/view"
         params = {
@@ -579,13 +1043,36 @@ class AsyncComfyUiClient:
             "subfolder": subfolder,
             "type": folder_type
         }
+        entry, headers = await self._cache_lookup(filename, subfolder, folder_type)
+        if entry is not None and not headers:
+            self._cache_record(folder_type, True)
+            return entry.data
+        writer = None
         try:
-            session = await self._get_session()
-            async with session.get(url, params=params) as response:
-                return await response.read()
+            response = await self._request('GET', url, params=params, headers=headers)
+            async with response:
+                if entry is not None and response.status == 304:
+                    self.cache.revalidated(entry)
+                    self._cache_record(folder_type, True)
+                    return entry.data
+                self._cache_record(folder_type, False)
+                if storage is None:
+                    file_data = await response.read()
+                else:
+                    # Spilling writes to a file, which would block the event loop
+                    loop = asyncio.get_running_loop()
+                    writer = await loop.run_in_executor(None, storage.writer, response.headers.get('Content-Length'))
+                    async for chunk in response.content.iter_chunked(_DOWNLOAD_CHUNK_SIZE):
+                        await loop.run_in_executor(None, writer.write, chunk)
+                    file_data = await loop.run_in_executor(None, writer.finish)
+                if response.status == 200 and isinstance(file_data, bytes):
+                    await self._cache_store(filename, subfolder, folder_type, file_data, response.headers)
+                return file_data
         except Exception as e:
-            print(f"Error getting file: {e}")
-            return None
+            if writer is not None:
+                # Closes and deletes the temp file of a spilled download
+                await asyncio.get_running_loop().run_in_executor(None, writer.abort)
+            return self._handle_error("getting file", e, None)
 
     async def get_image(self, filename, subfolder, folder_type):
         """
@@ -593,22 +1080,72 @@ class AsyncComfyUiClient:
         """
         return await self.get_view(filename, subfolder, folder_type)
 
-    async def wait_for_execution(self, prompt_id, check_interval=1):
+    async def wait_for_execution(self, prompt_id, check_interval=1, timeout=None):
         """
         Wait for a prompt execution to complete.
         
+        Connection errors and retryable HTTP statuses (e.g. a proxy's 502 while the
+        server restarts) are waited out. While the prompt is not in the history, the
+        queue is checked too: a prompt that is neither running nor pending was lost
+        (a restart clears the queue) and fails with `ComfyUiError` instead of waiting
+        forever.
+        
         Args:
             prompt_id (str): The prompt ID.
             check_interval (int): Seconds to wait between checks.
+            timeout (float, optional): Give up after this many seconds.
             
         Returns:
             dict: The output data from history.
         """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        next_queue_check = 0
         while True:
-            history = await self.get_history(prompt_id)
-            if prompt_id in history:
-                return history[prompt_id].get('outputs', {})
-            await asyncio.sleep(check_interval)
+            delay = check_interval
+            try:
+                outputs = await self._history_outputs(prompt_id)
+                if outputs is not None:
+                    return outputs
+                if time.monotonic() >= next_queue_check:
+                    next_queue_check = time.monotonic() + _QUEUE_CHECK_INTERVAL
+                    response = await self._request('GET', f"{self.base_url}/queue")
+                    async with response:
+                        queue = self._codec.loads(await response.read())
+                    if not _queue_contains(queue, prompt_id):
+                        # It may have finished between the two requests
+                        outputs = await self._history_outputs(prompt_id)
+                        if outputs is not None:
+                            return outputs
+                        error = ComfyUiError(f"Prompt {prompt_id} is neither queued nor in the history; "
+                                             "it was lost, e.g. because the server restarted")
+                        return self._handle_error("waiting for execution", error, {})
+            except (ComfyConnectionError, ComfyHTTPError) as e:
+                if isinstance(e, ComfyHTTPError) and e.status not in self._transport.retry.retry_statuses:
+                    return self._handle_error("waiting for execution", e, {})
+                # The server (or a proxy in front of it) may be restarting: keep waiting,
+                # but not faster than the circuit breaker lets requests through
+                print(f"Error waiting for execution: {e}")
+                delay = max(check_interval, self._transport.breaker.retry_after())
+                # A restart loses the queue, so check it as soon as the server is back
+                next_queue_check = 0
+            except Exception as e:
+                return self._handle_error("waiting for execution", e, {})
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    error = ComfyTimeoutError(f"Prompt {prompt_id} did not finish within {timeout}s")
+                    return self._handle_error("waiting for execution", error, {})
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+
+    async def _history_outputs(self, prompt_id):
+        """Outputs of a finished prompt, or None if it is not in the history yet."""
+        response = await self._request('GET', f"{self.base_url}/history/{prompt_id}")
+        async with response:
+            history = self._codec.loads(await response.read())
+        if prompt_id in history:
+            return history[prompt_id].get('outputs', {})
+        return None
 
     async def process_workflow(self, workflow):
         """
@@ -630,16 +1167,20 @@ class AsyncComfyUiClient:
         outputs = await self.wait_for_execution(prompt_id)
 
         # 3. Retrieve Files
+        return await self._fetch_outputs(outputs)
+
+    async def _fetch_outputs(self, outputs):
+        """
+        Download every file listed in execution outputs.
+        
+        Returns:
+            list[ComfyResponse]: The downloaded files.
+        """
         generated_files = []
-        for node_id, node_output in outputs.items():
-            # Iterate over all output types (images, gifs, videos, etc.)
-            for output_type, output_list in node_output.items():
-                if isinstance(output_list, list):
-                    for item in output_list:
-                        if isinstance(item, dict) and 'filename' in item and 'subfolder' in item and 'type' in item:
-                            file_data = await self.get_view(item['filename'], item['subfolder'], item['type'])
-                            if file_data:
-                                response = ComfyResponse(file_data, item['filename'], item['type'])
-                                generated_files.append(response)
+        for item in _iter_output_files(outputs):
+            file_data = await self.get_view(item['filename'], item['subfolder'], item['type'], self.storage)
+            if file_data:
+                response = ComfyResponse(file_data, item['filename'], item['type'])
+                generated_files.append(response)
         
         return generated_files
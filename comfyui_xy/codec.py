@@ -0,0 +1,114 @@
+import abc
+import json
+
+
+class JsonCodec(abc.ABC):
+    """
+    Encodes request bodies and decodes responses.
+
+    `dumps` returns UTF-8 bytes and `loads` accepts bytes or str, so request
+    and response bodies never go through an intermediate str.
+
+    NaN and Infinity are not valid JSON. The standard library writes them as
+    the `NaN`/`Infinity` literals that ComfyUI's parser accepts; orjson and
+    msgspec write them as `null`. Use the "json" codec for workflows that
+    carry non-finite floats.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def dumps(self, obj):
+        """Encode `obj` as UTF-8 JSON bytes."""
+
+    @abc.abstractmethod
+    def loads(self, data):
+        """Decode JSON from bytes or str."""
+
+
+class StdlibCodec(JsonCodec):
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        # Workflows can carry integer node IDs as keys
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        return self._orjson.dumps(obj, option=self._options)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    name = 'msgspec'
+
+    def __init__(self):
+        import msgspec
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj)
+
+    def loads(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return self._decoder.decode(data)
+
+
+# Tried in order when no codec is requested
+_CODECS = {
+    'orjson': OrjsonCodec,
+    'msgspec': MsgspecCodec,
+    'json': StdlibCodec,
+}
+
+
+def available_codecs():
+    """Names of the codecs whose library is installed."""
+    names = []
+    for name, codec_class in _CODECS.items():
+        try:
+            codec_class()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_codec(codec=None):
+    """
+    Resolve a codec.
+
+    Args:
+        codec (str | JsonCodec, optional): "orjson", "msgspec", "json" or a codec
+            instance. Defaults to the fastest installed library, falling back to
+            the standard library.
+
+    Returns:
+        JsonCodec: The codec.
+    """
+    if isinstance(codec, JsonCodec):
+        return codec
+    if codec is not None:
+        if codec not in _CODECS:
+            raise ValueError(f"Unknown JSON codec: {codec}")
+        return _CODECS[codec]()
+    for codec_class in _CODECS.values():
+        try:
+            return codec_class()
+        except ImportError:
+            continue
@@ -0,0 +1,462 @@
+"""
+Local coordinator shared by many processes on one host.
+
+Run one coordinator per host:
+
+    comfyui-xy-coordinator --url http://gpu1:8188 --url http://gpu2:8188
+
+and use `CoordinatorClient` in every worker process instead of its own
+`AsyncComfyUiClient`.
+"""
+import argparse
+import asyncio
+import getpass
+import hashlib
+import json
+import os
+import signal
+import struct
+import tempfile
+
+from .client import AsyncComfyUiClient, ComfyResponse
+from .codec import get_codec
+from .errors import ComfyConnectionError, ComfyUiError
+from .scheduling import AffinityScheduler
+
+
+def _default_socket_path():
+    """`comfyui_xy.sock` in a directory only the current user can access."""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'comfyui_xy.sock')
+    user = os.getuid() if hasattr(os, 'getuid') else getpass.getuser()
+    return os.path.join(tempfile.gettempdir(), f'comfyui_xy-{user}', 'comfyui_xy.sock')
+
+
+DEFAULT_SOCKET_PATH = _default_socket_path()
+
+# Every message is a 4-byte header length, a JSON header and the raw payloads
+# whose sizes the header lists under "sizes".
+_LENGTH = struct.Struct('>I')
+
+# Bytes read from the socket at a time when a payload is spilled to disk
+_PAYLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def workflow_key(workflow):
+    """
+    Key shared by identical workflows.
+
+    Returns:
+        str: SHA-256 of the workflow with sorted keys.
+    """
+    encoded = json.dumps(workflow, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+async def _write_message(writer, codec, header, payloads=()):
+    header = dict(header, sizes=[len(payload) for payload in payloads])
+    encoded = codec.dumps(header)
+    writer.write(_LENGTH.pack(len(encoded)))
+    writer.write(encoded)
+    for payload in payloads:
+        # Spilled outputs are sent from their memory map
+        writer.write(getattr(payload, 'buffer', payload))
+    await writer.drain()
+
+
+async def _read_header(reader, codec):
+    """Returns the header of the next message, or None once the peer has closed the connection."""
+    try:
+        length = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))[0]
+        return codec.loads(await reader.readexactly(length))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+async def _read_payload(reader, size, storage=None):
+    if storage is None or size <= storage.threshold:
+        return await reader.readexactly(size)
+    writer = storage.writer(size)
+    try:
+        while size:
+            chunk = await reader.readexactly(min(size, _PAYLOAD_CHUNK_SIZE))
+            writer.write(chunk)
+            size -= len(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+def _prepare_directory(directory):
+    """
+    Create the socket's directory, private to the current user.
+
+    A directory in the shared temp directory could have been created by
+    another user to swap the socket for their own, so it must be ours and
+    writable only by us.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory, mode=0o700)
+        return
+    if hasattr(os, 'getuid') and os.path.dirname(os.path.abspath(directory)) == tempfile.gettempdir():
+        stat = os.stat(directory)
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+            raise ComfyUiError(f"{directory} must be owned by the current user and not writable by others")
+
+
+async def _is_listening(path):
+    """Whether a process accepts connections on the Unix socket at `path`."""
+    try:
+        _, writer = await asyncio.open_unix_connection(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    writer.close()
+    return True
+
+
+class _InFlight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class Coordinator:
+    """
+    Owns the connections to the ComfyUI servers for every process on a host.
+
+    Worker processes attach over a Unix socket with `CoordinatorClient`. The
+    coordinator runs workflows through an `AffinityScheduler`, so the servers
+    see at most `per_server` workflows in flight no matter how many processes
+    submit, and only it polls for completion. A workflow identical to one
+    already in flight is not queued again: every requester receives the
+    outputs of the single execution.
+
+    The clients must be created with `raise_errors=True`. A client that prints
+    errors and returns empty results instead would hand every requester an
+    empty result for a failed workflow, indistinguishable from one that saved
+    nothing.
+    """
+
+    def __init__(self, clients, path=DEFAULT_SOCKET_PATH, per_server=1, fairness_window=8, codec=None):
+        """
+        Args:
+            clients (list[AsyncComfyUiClient]): One client per ComfyUI server, created
+                with `raise_errors=True` so failures reach the requesters as errors.
+            path (str): Path of the Unix socket to listen on.
+            per_server (int): Workflows in flight per server.
+            fairness_window (int): See `AffinityScheduler`.
+            codec (str | JsonCodec, optional): JSON codec for messages. Defaults to the
+                fastest installed one.
+        """
+        if not isinstance(clients, (list, tuple)):
+            clients = [clients]
+        self.clients = list(clients)
+        self.path = path
+        self._codec = get_codec(codec)
+        self._scheduler = AffinityScheduler(self.clients, fairness_window=fairness_window, per_server=per_server)
+        # Workflow key -> _InFlight of the execution shared by identical requests
+        self._inflight = {}
+        self._server = None
+        self._connections = set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def in_flight(self):
+        """Number of distinct workflows being processed."""
+        return len(self._inflight)
+
+    async def start(self):
+        """
+        Start listening on the socket, which only the current user can open.
+
+        A stale socket file left by a previous run is replaced.
+
+        Raises:
+            ComfyUiError: If another coordinator is listening on the socket.
+        """
+        _prepare_directory(os.path.dirname(self.path) or '.')
+        if os.path.exists(self.path):
+            if await _is_listening(self.path):
+                raise ComfyUiError(f"Another coordinator is listening on {self.path}")
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.path)
+        os.chmod(self.path, 0o600)
+
+    async def serve_forever(self):
+        """Start listening and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop listening and cancel pending workflows. The clients are closed as well."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        # Closing the server does not close the connections it accepted
+        for writer in self._connections:
+            writer.close()
+        self._connections.clear()
+        await self._scheduler.close()
+        for client in self.clients:
+            await client.close()
+
+    def _join(self, workflow):
+        """Join the execution of an identical workflow in flight, or start one."""
+        key = workflow_key(workflow)
+        entry = self._inflight.get(key)
+        if entry is None:
+            entry = _InFlight(asyncio.ensure_future(self._scheduler.process_workflow(workflow)))
+            self._inflight[key] = entry
+            entry.task.add_done_callback(lambda _: self._finish(key, entry))
+        entry.waiters += 1
+        return entry
+
+    def _leave(self, entry):
+        entry.waiters -= 1
+        if entry.waiters == 0 and entry.task.done():
+            self._close_results(entry.task)
+
+    def _finish(self, key, entry):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        # Every requester disconnected before the execution finished
+        if entry.waiters == 0:
+            self._close_results(entry.task)
+
+    def _close_results(self, task):
+        # Removes the temp files of spilled outputs once every requester has been sent them
+        if task.cancelled() or task.exception() is not None:
+            return
+        for result in task.result():
+            result.close()
+
+    async def _handle_connection(self, reader, writer):
+        lock = asyncio.Lock()
+        requests = set()
+        self._connections.add(writer)
+        try:
+            while True:
+                header = await _read_header(reader, self._codec)
+                if header is None:
+                    break
+                request = asyncio.ensure_future(self._handle_request(header, writer, lock))
+                requests.add(request)
+                request.add_done_callback(requests.discard)
+        except (ConnectionError, ValueError) as e:
+            print(f"Error reading from coordinator client: {e}")
+        finally:
+            for request in requests:
+                request.cancel()
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _handle_request(self, header, writer, lock):
+        entry = None
+        payloads = []
+        try:
+            try:
+                if header.get('op') != 'process_workflow':
+                    raise ValueError(f"Unknown operation: {header.get('op')}")
+                entry = self._join(header['workflow'])
+                # A requester that disconnects must not cancel the execution for the others
+                results = await asyncio.shield(entry.task)
+                reply = {'id': header.get('id'), 'outputs': [
+                    {'filename': result.filename, 'source_type': result.source_type} for result in results
+                ]}
+                payloads = [result.data for result in results]
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reply = {'id': header.get('id'), 'error': str(e), 'error_type': type(e).__name__}
+            async with lock:
+                await _write_message(writer, self._codec, reply, payloads)
+        except ConnectionError:
+            pass
+        finally:
+            if entry is not None:
+                self._leave(entry)
+
+
+class CoordinatorClient:
+    """
+    Submits workflows to a `Coordinator` from a worker process.
+
+    A drop-in replacement for `AsyncComfyUiClient.process_workflow`. Requests
+    share one connection and are matched to their replies, so many workflows
+    can be awaited concurrently.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH, storage=None, raise_errors=False, codec=None):
+        """
+        Args:
+            path (str): Path of the coordinator's Unix socket.
+            storage (SpillStorage, optional): Spill large outputs to disk as they are received.
+            raise_errors (bool): Raise `ComfyUiError` subclasses instead of printing errors and
+                returning [].
+            codec (str | JsonCodec, optional): JSON codec for messages.
+        """
+        self.path = path
+        self.storage = storage
+        self.raise_errors = raise_errors
+        self._codec = get_codec(codec)
+        self._reader = None
+        self._writer = None
+        self._receiver = None
+        self._connecting = None
+        self._lock = None
+        self._pending = {}
+        self._next_id = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        if self._receiver is not None:
+            self._receiver.cancel()
+            await asyncio.gather(self._receiver, return_exceptions=True)
+            self._receiver = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _handle_error(self, action, error, default):
+        """Raise `error` if `raise_errors` is set, otherwise log it and return `default`."""
+        if self.raise_errors:
+            raise error
+        print(f"Error {action}: {error}")
+        return default
+
+    async def _open(self):
+        self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        self._lock = asyncio.Lock()
+        self._receiver = asyncio.ensure_future(self._receive(self._reader))
+
+    async def _connect(self):
+        # Concurrent first calls share one connection attempt
+        if self._connecting is None or self._connecting.done():
+            self._connecting = asyncio.ensure_future(self._open())
+        await self._connecting
+
+    async def process_workflow(self, workflow):
+        """
+        Have the coordinator process a workflow.
+
+        Args:
+            workflow (dict): The workflow JSON.
+
+        Returns:
+            list[ComfyResponse]: List of generated outputs (images, videos, etc.).
+        """
+        try:
+            if self._writer is None:
+                await self._connect()
+            writer, lock = self._writer, self._lock
+            if writer is None:
+                raise ConnectionResetError("Connection closed")
+            self._next_id += 1
+            request_id = self._next_id
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            try:
+                async with lock:
+                    await _write_message(writer, self._codec,
+                                         {'id': request_id, 'op': 'process_workflow', 'workflow': workflow})
+                return await future
+            finally:
+                self._pending.pop(request_id, None)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            return self._handle_error("processing workflow", ComfyConnectionError(
+                f"Cannot reach coordinator at {self.path}: {e}"), [])
+        except ComfyUiError as e:
+            return self._handle_error("processing workflow", e, [])
+
+    async def _receive(self, reader):
+        error = ComfyConnectionError("Coordinator closed the connection")
+        try:
+            while True:
+                header = await _read_header(reader, self._codec)
+                if header is None:
+                    break
+                results = []
+                for output, size in zip(header.get('outputs', []), header['sizes']):
+                    data = await _read_payload(reader, size, self.storage)
+                    results.append(ComfyResponse(data, output['filename'], output['source_type']))
+                future = self._pending.get(header['id'])
+                if future is None or future.done():
+                    for result in results:
+                        result.close()
+                elif 'error' in header:
+                    future.set_exception(ComfyUiError(f"{header['error_type']}: {header['error']}"))
+                else:
+                    future.set_result(results)
+        except (OSError, ValueError) as e:
+            error = ComfyConnectionError(f"Lost connection to coordinator: {e}")
+        except asyncio.CancelledError:
+            error = ComfyConnectionError("Client closed")
+            raise
+        finally:
+            # Reconnect on the next request
+            if self._writer is not None and self._reader is reader:
+                self._writer.close()
+                self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Share ComfyUI server connections between local processes.")
+    parser.add_argument('--url', action='append', default=[], help="ComfyUI server URL. Repeat for several servers.")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help="Path of the Unix socket to listen on.")
+    parser.add_argument('--per-server', type=int, default=1, help="Workflows in flight per server.")
+    parser.add_argument('--fairness-window', type=int, default=8,
+                        help="Pending workflows considered when reordering for model affinity.")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        clients = [AsyncComfyUiClient(url=url, raise_errors=True) for url in args.url or ['http://127.0.0.1:8188']]
+        coordinator = Coordinator(clients, args.socket, per_server=args.per_server,
+                                  fairness_window=args.fairness_window)
+        try:
+            await coordinator.start()
+        except ComfyUiError as e:
+            print(f"Error starting coordinator: {e}")
+            await coordinator.close()
+            return 1
+        print(f"Coordinating {len(clients)} server(s) on {args.socket}")
+        serving = asyncio.ensure_future(coordinator.serve_forever())
+        # Stop cleanly (removing the socket file) when a process manager terminates us
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+        try:
+            await serving
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        return asyncio.run(serve()) or 0
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
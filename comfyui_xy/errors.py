@@ -0,0 +1,29 @@
+class ComfyUiError(Exception):
+    """Base class for errors raised by the ComfyUI clients."""
+
+
+class ComfyConnectionError(ComfyUiError):
+    """The server could not be reached or the connection failed."""
+
+
+class CircuitOpenError(ComfyConnectionError):
+    """The server failed repeatedly and requests to it are short-circuited."""
+
+    def __init__(self, base_url, retry_after):
+        super().__init__(f"Circuit open for {base_url}, retry in {retry_after:.1f}s")
+        self.base_url = base_url
+        self.retry_after = retry_after
+
+
+class ComfyHTTPError(ComfyUiError):
+    """The server answered with an error status."""
+
+    def __init__(self, status, text, url=None):
+        super().__init__(f"{status} {text}")
+        self.status = status
+        self.text = text
+        self.url = url
+
+
+class ComfyTimeoutError(ComfyUiError):
+    """A wait for the server exceeded its timeout."""
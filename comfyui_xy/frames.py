@@ -0,0 +1,228 @@
+import abc
+import io
+from fractions import Fraction
+
+from PIL import Image
+
+
+def _import_av():
+    try:
+        import av
+    except ImportError:
+        raise ImportError("Reading video frames requires PyAV: pip install comfyui_xy[video]") from None
+    return av
+
+
+def _open_source(source):
+    """A path is opened directly; bytes are wrapped without copying the download."""
+    if isinstance(source, str):
+        return source
+    return io.BytesIO(source)
+
+
+class FrameReader(abc.ABC):
+    """
+    Lazy, frame-level access to a video or animated image.
+
+    Frames are decoded only when requested, as `PIL.Image` objects.
+    Indexing supports negative indices; iteration streams frames in order.
+    """
+
+    @property
+    @abc.abstractmethod
+    def count(self):
+        """Number of frames, or None if it is unknown (see `VideoFrameReader.count`)."""
+
+    @property
+    @abc.abstractmethod
+    def fps(self):
+        """Frames per second, or None if unknown."""
+
+    @abc.abstractmethod
+    def get_frame(self, index):
+        """
+        Decode a single frame.
+
+        Args:
+            index (int): Frame index (negative counts from the end).
+
+        Returns:
+            PIL.Image.Image: The frame.
+        """
+
+    @abc.abstractmethod
+    def iter_frames(self, start=0, stop=None, step=1):
+        """
+        Stream frames in order.
+
+        Yields:
+            PIL.Image.Image: Every `step`-th frame from `start` up to `stop`.
+        """
+
+    def close(self):
+        pass
+
+    def _normalize(self, index):
+        count = self.count
+        if count is None:
+            # Past-the-end indices are only found out by decoding
+            if index < 0:
+                raise IndexError("Negative frame indices need a known frame count")
+            return index
+        if index < 0:
+            index += count
+        if index < 0 or index >= count:
+            raise IndexError(f"Frame index out of range: {index}")
+        return index
+
+    def __len__(self):
+        count = self.count
+        if count is None:
+            raise TypeError("The frame count is unknown; iterate with iter_frames() instead")
+        return count
+
+    def __getitem__(self, index):
+        return self.get_frame(index)
+
+    def __iter__(self):
+        return self.iter_frames()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ImageFrameReader(FrameReader):
+    """Frames of an image read with Pillow: every frame of an animated GIF, WebP or PNG, or a single frame."""
+
+    def __init__(self, source):
+        self._image = Image.open(_open_source(source))
+
+    @property
+    def count(self):
+        return getattr(self._image, 'n_frames', 1)
+
+    @property
+    def fps(self):
+        duration = self._image.info.get('duration')
+        return 1000 / duration if duration else None
+
+    def get_frame(self, index):
+        self._image.seek(self._normalize(index))
+        return self._image.convert('RGBA' if 'transparency' in self._image.info else 'RGB')
+
+    def iter_frames(self, start=0, stop=None, step=1):
+        stop = self.count if stop is None else min(stop, self.count)
+        for index in range(start, stop, step):
+            yield self.get_frame(index)
+
+    def close(self):
+        self._image.close()
+
+
+class VideoFrameReader(FrameReader):
+    """
+    Frames of a video container (mp4, webm, mkv, ...), read with PyAV.
+
+    Frame count and rate come from the stream header. Random access seeks to
+    the nearest preceding keyframe and decodes forward from there, so only
+    that group of pictures is decoded.
+    """
+
+    def __init__(self, source):
+        self._av = _import_av()
+        self._source = source
+        self._open()
+
+    def _open(self):
+        self._container = self._av.open(_open_source(self._source))
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = 'AUTO'
+
+    @property
+    def fps(self):
+        rate = self._stream.average_rate or self._stream.guessed_rate
+        return float(rate) if rate else None
+
+    @property
+    def count(self):
+        """
+        Number of frames from the header, or derived from the duration and fps for
+        containers that do not store it (e.g. webm). None if neither is available
+        (e.g. a raw stream): `len()` then raises `TypeError` and only non-negative
+        indices and `iter_frames()` can be used.
+        """
+        if self._stream.frames:
+            return self._stream.frames
+        fps = self.fps
+        if self._stream.duration is not None and fps:
+            return int(round(float(self._stream.duration * self._stream.time_base) * fps))
+        if self._container.duration is not None and fps:
+            return int(round(self._container.duration / 1000000 * fps))
+        return None
+
+    def _frame_index(self, frame):
+        fps = self.fps
+        if frame.pts is None or not fps:
+            # Counted from the seek position instead, which is the start without a frame rate
+            return None
+        start = self._stream.start_time or 0
+        return int(round(float((frame.pts - start) * self._stream.time_base) * fps))
+
+    def _seek(self, index):
+        """Seek to the keyframe at or before `index`."""
+        fps = self.fps
+        try:
+            if not fps or index == 0:
+                self._container.seek(0)
+                return
+            start = self._stream.start_time or 0
+            target = start + int(Fraction(index) / Fraction(fps).limit_denominator(1000000) / self._stream.time_base)
+            self._container.seek(target, stream=self._stream, backward=True, any_frame=False)
+        except self._av.error.FFmpegError:
+            # Raw streams cannot seek: decode again from the start
+            self._container.close()
+            self._open()
+
+    def get_frame(self, index):
+        index = self._normalize(index)
+        for frame in self.iter_frames(index, index + 1):
+            return frame
+        raise IndexError(f"Frame index out of range: {index}")
+
+    def iter_frames(self, start=0, stop=None, step=1):
+        self._seek(start)
+        position = None
+        for frame in self._container.decode(self._stream):
+            frame_index = self._frame_index(frame)
+            # Frames without timestamps are counted from the seek position
+            position = frame_index if frame_index is not None else (0 if position is None else position + 1)
+            if position < start:
+                continue
+            if stop is not None and position >= stop:
+                break
+            if (position - start) % step == 0:
+                yield frame.to_image()
+
+    def close(self):
+        self._container.close()
+
+
+def open_frames(source, filename):
+    """
+    Open a frame reader for a video or animated image.
+
+    Args:
+        source (str | bytes): A file path or the file data.
+        filename (str): Used to pick the decoder from the extension: Pillow for any
+            image format it supports, PyAV for everything else.
+
+    Returns:
+        FrameReader: The reader.
+    """
+    ext = '.' + filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    if ext in Image.registered_extensions():
+        return ImageFrameReader(source)
+    return VideoFrameReader(source)
@@ -0,0 +1,209 @@
+import asyncio
+import copy
+import json
+
+# Latent nodes whose `batch_size` input batches the whole sampling pipeline
+BATCHABLE_LATENTS = ('EmptyLatentImage', 'EmptySD3LatentImage')
+
+# Inputs holding the sampler seed (KSampler, KSamplerAdvanced, RandomNoise)
+SEED_INPUTS = ('seed', 'noise_seed')
+
+
+def fusion_key(workflow):
+    """
+    Key shared by workflows that can be fused into one batched prompt.
+
+    Workflows are compatible when they are identical except for their sampler
+    seeds and contain exactly one empty-latent node with ``batch_size`` 1.
+    Text prompts must match: a batch shares one conditioning in ComfyUI.
+
+    Returns:
+        str: The key, or None if the workflow cannot be batched.
+    """
+    latents = [node for node in workflow.values() if node.get('class_type') in BATCHABLE_LATENTS]
+    if len(latents) != 1 or latents[0].get('inputs', {}).get('batch_size') != 1:
+        return None
+
+    template = copy.deepcopy(workflow)
+    for node in template.values():
+        inputs = node.get('inputs', {})
+        for name in SEED_INPUTS:
+            if isinstance(inputs.get(name), int):
+                inputs[name] = None
+    try:
+        return json.dumps(template, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+
+
+def fuse_workflows(workflows):
+    """
+    Rewrite compatible workflows into one batched workflow.
+
+    The batch is sampled from the first workflow's seed, so the individual
+    seeds of the others are not reproduced.
+    """
+    fused = copy.deepcopy(workflows[0])
+    for node in fused.values():
+        if node.get('class_type') in BATCHABLE_LATENTS:
+            node['inputs']['batch_size'] = len(workflows)
+    return fused
+
+
+def batched_nodes(workflow):
+    """
+    IDs of the batched latent node and of every node that depends on it.
+
+    Only these nodes see the batch; the others (loaders, text encoders, ...)
+    run once for the whole prompt.
+    """
+    consumers = {}
+    for node_id, node in workflow.items():
+        for value in node.get('inputs', {}).values():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) in workflow:
+                consumers.setdefault(str(value[0]), []).append(str(node_id))
+    stack = [str(node_id) for node_id, node in workflow.items() if node.get('class_type') in BATCHABLE_LATENTS]
+    found = set(stack)
+    while stack:
+        for consumer in consumers.get(stack.pop(), ()):
+            if consumer not in found:
+                found.add(consumer)
+                stack.append(consumer)
+    return found
+
+
+def split_outputs(workflow, outputs, count):
+    """
+    Split the outputs of a batched execution into `count` per-request outputs.
+
+    Output lists of the nodes in `batched_nodes` are cut into `count` equal
+    consecutive slices in batch order. Outputs of other nodes do not depend on
+    the batch and are given to every request.
+
+    Args:
+        workflow (dict): The fused workflow that was executed.
+        outputs (dict): Its outputs, as returned by `wait_for_execution`.
+        count (int): Number of fused requests.
+
+    Raises:
+        ValueError: If a batched output cannot be split evenly, e.g. an animation
+            combining the whole batch into one file.
+    """
+    batched = batched_nodes(workflow)
+    parts = [{} for _ in range(count)]
+    for node_id, node_output in outputs.items():
+        for part in parts:
+            part[node_id] = {}
+        for output_type, value in node_output.items():
+            if str(node_id) in batched and isinstance(value, list):
+                if len(value) % count:
+                    raise ValueError(f"Cannot split {len(value)} {output_type} of node {node_id} "
+                                     f"between {count} requests")
+                size = len(value) // count
+                for i, part in enumerate(parts):
+                    part[node_id][output_type] = value[i * size:(i + 1) * size]
+            else:
+                for part in parts:
+                    part[node_id][output_type] = value
+    return parts
+
+
+class FusionSubmitter:
+    """
+    Opt-in submission layer for `AsyncComfyUiClient` that fuses seed-only variants.
+
+    Workflows submitted within `window` seconds that differ only in their
+    sampler seed are queued as one prompt with a larger ``batch_size``, which
+    keeps the GPU busier than running them one at a time. The batched outputs
+    are split back into one `ComfyResponse` list per caller. Other workflows
+    are passed straight to `process_workflow`.
+
+    Each caller receives a different image of the batch, but not the image its
+    own seed would have produced; only use this when seeds are random.
+
+    If the outputs of a batch cannot be split per request (the graph combines
+    the batch, e.g. into one animation), its workflows are run again one by
+    one and workflows of that graph are no longer fused.
+    """
+
+    def __init__(self, client, window=0.05, max_batch=8):
+        """
+        Args:
+            client (AsyncComfyUiClient): The client used to submit prompts.
+            window (float): Seconds to wait for compatible workflows before submitting.
+            max_batch (int): Maximum number of workflows fused into one prompt.
+        """
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}
+        # Fusion keys of graphs whose batched outputs could not be split
+        self._unfusable = set()
+        # The event loop only keeps weak references to tasks
+        self._tasks = set()
+
+    async def process_workflow(self, workflow):
+        """
+        Process a workflow, fusing it with compatible pending ones.
+
+        Returns:
+            list[ComfyResponse]: The outputs of this workflow.
+        """
+        key = fusion_key(workflow) if self.max_batch > 1 else None
+        if key is None or key in self._unfusable:
+            return await self.client.process_workflow(workflow)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        group = self._pending.setdefault(key, [])
+        group.append((workflow, future))
+        if len(group) >= self.max_batch:
+            # Detach the full group now so later workflows start a new one
+            del self._pending[key]
+            self._start(key, group)
+        elif len(group) == 1:
+            loop.call_later(self.window, self._flush, key, group)
+        return await future
+
+    def _flush(self, key, group):
+        # The timer may fire after its group was already submitted for being full
+        if self._pending.get(key) is group:
+            del self._pending[key]
+            self._start(key, group)
+
+    def _start(self, key, group):
+        task = asyncio.ensure_future(self._run_group(key, group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_group(self, key, group):
+        try:
+            if len(group) == 1:
+                results = [await self.client.process_workflow(group[0][0])]
+            else:
+                results = await self._run_batch(key, [workflow for workflow, _ in group])
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(group, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_batch(self, key, workflows):
+        fused = fuse_workflows(workflows)
+        prompt_id = await self.client.queue_prompt(fused)
+        if not prompt_id:
+            return [[] for _ in workflows]
+        outputs = await self.client.wait_for_execution(prompt_id)
+        try:
+            parts = split_outputs(fused, outputs, len(workflows))
+        except ValueError:
+            self._unfusable.add(key)
+            return await asyncio.gather(*[self.client.process_workflow(workflow) for workflow in workflows])
+        results = []
+        for part in parts:
+            results.append(await self.client._fetch_outputs(part))
+        return results
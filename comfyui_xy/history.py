@@ -0,0 +1,254 @@
+import codecs
+import json
+import re
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',}'
+
+# A complete string, and the body of a string up to its closing quote or up to
+# a backslash that ends the text (an escape sequence split between chunks)
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+_NOT_BRACKET = re.compile(r'[^{}\[\]]+')
+_BRACKET_PAIR = re.compile(r'\{\}|\[\]')
+
+# Characters scanned at first when looking for the end of a value in a chunk
+_SCAN_WINDOW = 4096
+
+
+class JsonObjectStream:
+    """
+    Incremental parser for the members of a top-level JSON object.
+
+    Chunks are fed as they arrive from the network and every call returns the
+    ``(key, value)`` pairs completed so far. Only the member currently being
+    parsed is buffered, so memory is bounded by the largest single member
+    instead of the size of the whole document.
+
+    A value that does not fit in the buffered chunks is not decoded again with
+    every chunk: its nesting depth and string state are carried from chunk to
+    chunk and it is decoded once, when it is complete, so the work per chunk
+    is proportional to the chunk.
+    """
+
+    def __init__(self):
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._state = 'start'
+        self._key = None
+        # Scan of the current object, array or string value
+        self._scanning = False
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        """
+        Feed a chunk of the document.
+
+        Args:
+            chunk (bytes | str): The next piece of the JSON document.
+
+        Returns:
+            list[tuple]: The ``(key, value)`` pairs completed by this chunk.
+        """
+        if isinstance(chunk, bytes):
+            chunk = self._text_decoder.decode(chunk)
+        self._buffer += chunk
+        return self._parse(final=False)
+
+    def close(self):
+        """
+        Signal the end of the document.
+
+        Returns:
+            list[tuple]: Any remaining ``(key, value)`` pairs.
+
+        Raises:
+            ValueError: If the document is not a complete JSON object.
+        """
+        self._buffer += self._text_decoder.decode(b'', final=True)
+        items = self._parse(final=True)
+        if self._state != 'end':
+            raise ValueError("Incomplete JSON object")
+        return items
+
+    def _scan(self, text):
+        """
+        Continue scanning the current value over the next piece of text.
+
+        Strings are skipped and bracket pairs cancelled with regular
+        expressions, so a chunk is scanned without a Python-level loop over
+        its characters.
+
+        Returns:
+            bool: Whether the value ends in this text. If not, the nesting depth
+            and string state are updated for the next chunk.
+        """
+        pos = 0
+        if not text:
+            return False
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+                pos += 1
+            pos = _STRING_BODY.match(text, pos).end()
+            if pos >= len(text):
+                return False
+            if text[pos] == '\\':
+                # Last character of the chunk; the escaped one follows in the next
+                self._escape = True
+                return False
+            self._in_string = False
+            pos += 1
+            if self._depth == 0:
+                return True
+
+        rest = _STRING.sub('', text[pos:])
+        quote = rest.find('"')
+        if quote >= 0:
+            # A string that continues in the next chunk
+            rest = rest[:quote]
+            self._in_string = True
+            self._escape = (len(text) - len(text.rstrip('\\'))) % 2 == 1
+
+        # Cancel matched pairs, leaving the unmatched closing then opening brackets
+        rest = _NOT_BRACKET.sub('', rest)
+        count = 1
+        while count:
+            rest, count = _BRACKET_PAIR.subn('', rest)
+        closing = len(rest) - len(rest.lstrip('}]'))
+        if closing >= self._depth:
+            return True
+        self._depth += len(rest) - 2 * closing
+        return False
+
+    def _parse(self, final):
+        items = []
+        buf = self._buffer
+        pos = 0
+        while True:
+            if self._scanning:
+                # Growing windows keep the scan short when the value ends early in the chunk
+                window = _SCAN_WINDOW
+                complete = False
+                while pos < len(buf) and not complete:
+                    piece = buf[pos:pos + window]
+                    self._parts.append(piece)
+                    pos += len(piece)
+                    complete = self._scan(piece)
+                    window *= 2
+                if not complete:
+                    buf, pos = '', 0
+                    break
+                text = ''.join(self._parts)
+                self._parts = []
+                self._scanning = False
+                value, end = self._decoder.raw_decode(text)
+                buf, pos = text[end:] + buf[pos:], 0
+                items.append((self._key, value))
+                self._key = None
+                self._state = 'separator'
+                continue
+
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buf):
+                break
+
+            char = buf[pos]
+            if self._state == 'start':
+                if char != '{':
+                    raise ValueError(f"Expected '{{' at start of JSON object, got {char!r}")
+                self._state = 'first_key'
+                pos += 1
+            elif self._state == 'first_key' and char == '}':
+                self._state = 'end'
+                pos += 1
+            elif self._state in ('first_key', 'key'):
+                if char != '"':
+                    raise ValueError(f"Expected object key, got {char!r}")
+                try:
+                    self._key, pos = self._decoder.raw_decode(buf, pos)
+                except ValueError:
+                    break
+                self._state = 'colon'
+            elif self._state == 'colon':
+                if char != ':':
+                    raise ValueError(f"Expected ':', got {char!r}")
+                self._state = 'value'
+                pos += 1
+            elif self._state == 'value':
+                try:
+                    value, end = self._decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if final:
+                        raise
+                    if char in '{["':
+                        # Scan the rest of the value as it arrives instead of
+                        # decoding it again from the start with every chunk
+                        self._scanning = True
+                        self._depth = 0 if char == '"' else 1
+                        self._in_string = char == '"'
+                        self._escape = False
+                        if self._scan(buf[pos + 1:]):
+                            # Complete, so it is invalid rather than cut off
+                            raise
+                        self._parts.append(buf[pos:])
+                        buf, pos = '', 0
+                    break
+                if not final and char not in '{["' and (end >= len(buf) or buf[end] not in _DELIMITERS):
+                    # A number or literal may continue in the next chunk.
+                    break
+                items.append((self._key, value))
+                self._key = None
+                self._state = 'separator'
+                pos = end
+            elif self._state == 'separator':
+                if char == ',':
+                    self._state = 'key'
+                elif char == '}':
+                    self._state = 'end'
+                else:
+                    raise ValueError(f"Expected ',' or '}}', got {char!r}")
+                pos += 1
+            else:
+                raise ValueError("Extra data after JSON object")
+
+        self._buffer = buf[pos:]
+        return items
+
+
+class HistoryScan:
+    """
+    Collects the history entries that follow a given prompt ID.
+
+    ComfyUI returns history oldest first, so everything after ``since`` in a
+    page is new. Entries before it are dropped as soon as it is seen.
+    """
+
+    def __init__(self, since):
+        self.since = since
+        self.found = False
+        self.count = 0
+        self.entries = []
+
+    def add(self, prompt_id, entry):
+        self.count += 1
+        if prompt_id == self.since:
+            self.found = True
+            self.entries = []
+        else:
+            self.entries.append((prompt_id, entry))
+
+    def is_complete(self, max_items):
+        """
+        Whether the scanned page is enough to know every new entry.
+
+        True when ``since`` was found, or when the page was not full (the
+        whole history was returned, e.g. because ``since`` was evicted).
+        """
+        return self.found or self.count < max_items
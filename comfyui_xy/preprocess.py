@@ -0,0 +1,179 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+
+# Pillow format names for the extensions accepted by `ImageTransform(format=...)`
+_FORMATS = {
+    'png': 'PNG',
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'webp': 'WEBP',
+}
+
+# Modes each output format can store; anything else (e.g. CMYK) is converted first
+_SAVE_MODES = {
+    'JPEG': ('RGB', 'L'),
+    'PNG': ('1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA'),
+    'WEBP': ('RGB', 'RGBA'),
+}
+
+# Nodes that scale their image input to a fixed `width` x `height`. Other nodes
+# with those inputs (ImageCrop, ImagePadForOutpaint, ...) use them in pixels of
+# the original image, so shrinking the upload would change their result.
+_RESIZE_NODES = ('ImageScale', 'ImageResize+', 'ImageResizeKJ', 'Image Resize')
+
+# Inputs that give the fixed size a consuming node scales its image to
+_SIZE_INPUTS = ('width', 'height')
+
+
+class ImageTransform:
+    """
+    Client-side transform applied to an image before it is uploaded.
+
+    Shrinking and re-encoding large photos locally avoids uploading megabytes
+    that the workflow would throw away when it scales the image down.
+    """
+
+    def __init__(self, max_side=None, size=None, format=None, quality=90, strip_metadata=True):
+        """
+        Args:
+            max_side (int, optional): Downscale so that the longest side is at most this many pixels.
+            size (tuple, optional): (width, height) required by the target node. The image is
+                downscaled, keeping its aspect ratio, to the smallest size that still covers it.
+            format (str, optional): Re-encode to "png", "jpeg" or "webp". Defaults to the source format.
+            quality (int): Encoder quality for JPEG and WebP.
+            strip_metadata (bool): Drop EXIF, ICC and text metadata. EXIF orientation is applied first.
+        """
+        if format is not None and format.lower() not in _FORMATS:
+            raise ValueError(f"Unsupported format: {format}")
+        self.max_side = max_side
+        self.size = size
+        self.format = format.lower() if format else None
+        self.quality = quality
+        self.strip_metadata = strip_metadata
+
+    @classmethod
+    def for_node(cls, workflow, node_id, **kwargs):
+        """
+        Build a transform sized for the node that consumes the output of `node_id`.
+
+        Uses the `width`/`height` of the resize node (e.g. ImageScale) that takes the
+        output of the LoadImage node `node_id`. If another kind of node also consumes
+        it, the size is left alone and only the other options are applied.
+
+        Args:
+            workflow (dict): The workflow JSON.
+            node_id (str): ID of the node the uploaded image is set on.
+            **kwargs: Other `ImageTransform` options.
+        """
+        kwargs.setdefault('size', target_size(workflow, node_id))
+        return cls(**kwargs)
+
+    def _target_scale(self, width, height):
+        scale = 1.0
+        if self.max_side:
+            scale = min(scale, self.max_side / max(width, height))
+        if self.size:
+            target_width, target_height = self.size
+            scale = min(scale, max(target_width / width, target_height / height))
+        return scale
+
+    def apply(self, image_path):
+        """
+        Load and transform an image.
+
+        Args:
+            image_path (str): Path to the image file.
+
+        Returns:
+            tuple: (bytes, filename) to upload. The original bytes are returned
+            unchanged if nothing needs to be done.
+        """
+        filename = _basename(image_path)
+        with open(image_path, 'rb') as f:
+            original = f.read()
+
+        image = Image.open(io.BytesIO(original))
+        source_format = image.format or 'PNG'
+        target_format = _FORMATS[self.format] if self.format else source_format
+        scale = self._target_scale(*image.size)
+        if scale >= 1 and target_format == source_format and not self.strip_metadata:
+            return original, filename
+
+        info = image.info
+        image = ImageOps.exif_transpose(image) if self.strip_metadata else image
+        if scale < 1:
+            new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(new_size, Image.LANCZOS)
+
+        save_kwargs = {}
+        if target_format in ('JPEG', 'WEBP'):
+            save_kwargs['quality'] = self.quality
+        image = _convert_mode(image, target_format)
+        if not self.strip_metadata:
+            for key in ('exif', 'icc_profile'):
+                if info.get(key):
+                    save_kwargs[key] = info[key]
+
+        output = io.BytesIO()
+        image.save(output, format=target_format, **save_kwargs)
+        if self.format:
+            filename = f"{os.path.splitext(filename)[0]}.{self.format}"
+        return output.getvalue(), filename
+
+
+def _basename(path):
+    """File name of a path using either separator."""
+    return path.split('/')[-1].split('\\')[-1]
+
+
+def _convert_mode(image, target_format):
+    """Convert `image` to a mode `target_format` can store, keeping transparency where it can."""
+    modes = _SAVE_MODES.get(target_format)
+    if modes is None or image.mode in modes:
+        return image
+    if 'RGBA' in modes and ('A' in image.mode or 'transparency' in image.info):
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def target_size(workflow, node_id):
+    """
+    Find the (width, height) a node's image output is scaled to.
+
+    Only known resize nodes (`_RESIZE_NODES`) count. If the output also goes to
+    any other node, that node sees the original pixels and nothing is returned.
+    With several resize nodes, the size covers all of them.
+
+    Returns:
+        tuple: (width, height), or None if the image must keep its size.
+    """
+    size = None
+    for node in workflow.values():
+        inputs = node.get('inputs', {})
+        consumes = any(isinstance(value, list) and len(value) == 2 and str(value[0]) == str(node_id)
+                       for value in inputs.values())
+        if not consumes:
+            continue
+        if node.get('class_type') not in _RESIZE_NODES:
+            return None
+        if not all(isinstance(inputs.get(name), int) and inputs.get(name) > 0 for name in _SIZE_INPUTS):
+            # Sized from the image (e.g. 0 keeps the aspect ratio)
+            return None
+        width, height = inputs['width'], inputs['height']
+        size = (max(size[0], width), max(size[1], height)) if size else (width, height)
+    return size
+
+
+def read_upload(image_path, transform=None):
+    """
+    Read a file to upload, applying `transform` if given.
+
+    Returns:
+        tuple: (bytes, filename)
+    """
+    if transform is not None:
+        return transform.apply(image_path)
+    with open(image_path, 'rb') as f:
+        return f.read(), _basename(image_path)
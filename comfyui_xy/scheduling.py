@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+
+
+def affinity_key(workflow):
+    """
+    Models a workflow loads, taken from its loader nodes.
+
+    Collects the ``*_name`` inputs (``ckpt_name``, ``lora_name``, ``vae_name``, ...)
+    of every node whose class type contains "Loader".
+
+    Returns:
+        tuple: Sorted (input name, value) pairs. Empty if nothing is loaded.
+    """
+    models = set()
+    for node in workflow.values():
+        if 'Loader' not in str(node.get('class_type', '')):
+            continue
+        for name, value in node.get('inputs', {}).items():
+            if name.endswith('_name') and isinstance(value, str):
+                models.add((name, value))
+    return tuple(sorted(models))
+
+
+def subgraph_hashes(workflow):
+    """
+    Hash of the subgraph ending at every node.
+
+    A node's hash covers its class type, literal inputs and the hashes of the
+    nodes it is linked to, so two workflows share a hash exactly where ComfyUI
+    can reuse a cached node result (loaded models, encoded prompts, ...).
+
+    Returns:
+        set: The subgraph hashes.
+    """
+    memo = {}
+
+    def node_hash(node_id, visiting):
+        if node_id in memo:
+            return memo[node_id]
+        if node_id in visiting or node_id not in workflow:
+            return None
+        visiting.add(node_id)
+        node = workflow[node_id]
+        inputs = {}
+        for name, value in node.get('inputs', {}).items():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) in workflow:
+                inputs[name] = [node_hash(str(value[0]), visiting), value[1]]
+            else:
+                inputs[name] = value
+        visiting.discard(node_id)
+        encoded = json.dumps([node.get('class_type'), inputs], sort_keys=True, default=str)
+        memo[node_id] = hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+        return memo[node_id]
+
+    return {node_hash(str(node_id), set()) for node_id in workflow}
+
+
+class _Job:
+    __slots__ = ('workflow', 'future', 'key', 'hashes', 'skipped')
+
+    def __init__(self, workflow, future):
+        self.workflow = workflow
+        self.future = future
+        self.key = affinity_key(workflow)
+        self.hashes = subgraph_hashes(workflow)
+        self.skipped = 0
+
+
+class _Server:
+    __slots__ = ('client', 'last_key', 'last_hashes')
+
+    def __init__(self, client):
+        self.client = client
+        self.last_key = None
+        self.last_hashes = set()
+
+
+class AffinityScheduler:
+    """
+    Reorders submissions to maximize ComfyUI node cache hits.
+
+    ComfyUI keeps the results of recently executed nodes (loaded checkpoints,
+    LoRAs, encoded prompts), so switching models between prompts costs a full
+    model load. Workflows are held client-side and each server is given the
+    pending workflow that loads the same models as its previous one, then the
+    one sharing the most cached subgraphs. With several servers, a workflow
+    goes to the server that last loaded its models.
+
+    Only the oldest `fairness_window` workflows are considered, and a workflow
+    that has been passed over `fairness_window` times is run next, so no
+    workflow waits indefinitely.
+    """
+
+    def __init__(self, clients, fairness_window=8, per_server=1):
+        """
+        Args:
+            clients (list[AsyncComfyUiClient]): One client per ComfyUI server.
+            fairness_window (int): How many of the oldest pending workflows are
+                considered, and how often one may be passed over.
+            per_server (int): Workflows in flight per server. Keep it low: work already
+                queued on the server can no longer be reordered.
+        """
+        if not isinstance(clients, (list, tuple)):
+            clients = [clients]
+        self.fairness_window = max(1, fairness_window)
+        self.per_server = max(1, per_server)
+        self._servers = [_Server(client) for client in clients]
+        self._pending = []
+        self._condition = None
+        self._workers = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def process_workflow(self, workflow):
+        """
+        Queue a workflow and wait for its outputs.
+
+        Returns:
+            list[ComfyResponse]: The outputs of this workflow.
+        """
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        async with self._condition:
+            self._pending.append(_Job(workflow, future))
+            self._condition.notify()
+        return await future
+
+    async def close(self):
+        """Stop the workers. Workflows still pending are cancelled."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self._pending:
+            job.future.cancel()
+        self._pending = []
+
+    def _ensure_workers(self):
+        if self._workers:
+            return
+        # Created here so it binds to the running event loop
+        self._condition = asyncio.Condition()
+        for server in self._servers:
+            for _ in range(self.per_server):
+                self._workers.append(asyncio.ensure_future(self._work(server)))
+
+    def _score(self, job, server):
+        claimed = any(other is not server and other.last_key == job.key and job.key
+                      for other in self._servers)
+        return (
+            job.key == server.last_key,
+            not claimed,
+            len(job.hashes & server.last_hashes),
+        )
+
+    def _pick(self, server):
+        window = self._pending[:self.fairness_window]
+        if window[0].skipped >= self.fairness_window:
+            chosen = 0
+        else:
+            # max() keeps the first (oldest) job among equal scores
+            chosen = max(range(len(window)), key=lambda i: self._score(window[i], server))
+        for job in window[:chosen]:
+            job.skipped += 1
+        return self._pending.pop(chosen)
+
+    async def _work(self, server):
+        while True:
+            async with self._condition:
+                while not self._pending:
+                    await self._condition.wait()
+                job = self._pick(server)
+                server.last_key = job.key
+                server.last_hashes = job.hashes
+
+            if job.future.cancelled():
+                continue
+            try:
+                result = await server.client.process_workflow(job.workflow)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+            if not job.future.done():
+                job.future.set_result(result)
@@ -0,0 +1,150 @@
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import weakref
+
+
+class SpillStorage:
+    """
+    Storage backend that keeps large downloads on disk instead of in memory.
+
+    Files up to `threshold` bytes stay in memory as `bytes`. Larger files are
+    streamed to a temporary file and exposed through a read-only memory map,
+    so a batch of long videos does not have to fit in RAM.
+    """
+
+    def __init__(self, threshold=32 * 1024 * 1024, directory=None):
+        """
+        Args:
+            threshold (int): Size in bytes above which a download is spilled to disk.
+            directory (str, optional): Directory for temporary files. Defaults to the
+                system temp directory. Put it on the same filesystem as the files are
+                saved to so `save()` can hardlink instead of copying.
+        """
+        self.threshold = threshold
+        self.directory = directory
+
+    def writer(self, expected_size=None):
+        """
+        Start a download.
+
+        Args:
+            expected_size (int | str, optional): Content-Length of the response, if known.
+
+        Returns:
+            SpillWriter: Writer that chunks are fed into.
+        """
+        return SpillWriter(self.threshold, self.directory, expected_size)
+
+
+class SpillWriter:
+    """
+    Collects a download in memory, moving it to a temp file once it passes the threshold.
+
+    Once spilled, `write`, `finish` and `abort` do blocking file I/O; `AsyncComfyUiClient`
+    calls them in an executor.
+    """
+
+    def __init__(self, threshold, directory=None, expected_size=None):
+        self.threshold = threshold
+        self.directory = directory
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._path = None
+        if expected_size is not None and int(expected_size) > threshold:
+            self._spill()
+
+    def _spill(self):
+        fd, self._path = tempfile.mkstemp(prefix='comfyui_xy_', suffix='.spill', dir=self.directory)
+        self._file = os.fdopen(fd, 'wb')
+        self._file.write(self._buffer.getbuffer())
+        self._buffer = None
+
+    def write(self, chunk):
+        if self._file is not None:
+            self._file.write(chunk)
+            return
+        self._buffer.write(chunk)
+        if self._buffer.tell() > self.threshold:
+            self._spill()
+
+    def finish(self):
+        """
+        Returns:
+            bytes | SpilledFile: The downloaded data.
+        """
+        if self._file is None:
+            return self._buffer.getvalue()
+        self._file.close()
+        return SpilledFile(self._path)
+
+    def abort(self):
+        """Discard a partial download."""
+        if self._file is not None:
+            self._file.close()
+            _remove(self._path)
+
+
+class SpilledFile:
+    """
+    A downloaded file kept on disk and memory-mapped read-only.
+
+    The temp file is deleted when the object is closed or garbage collected.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._mmap = None
+        if self.size:
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._finalizer = weakref.finalize(self, _cleanup, self._mmap, path)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def buffer(self):
+        """Zero-copy `memoryview` of the file contents."""
+        if self._mmap is None:
+            return memoryview(b'')
+        return memoryview(self._mmap)
+
+    def save(self, path):
+        """
+        Save the file to `path` without copying it through memory.
+
+        A hardlink is used when possible, falling back to a file copy
+        (e.g. when `path` is on another filesystem).
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.link(self.path, tmp_path)
+            os.replace(tmp_path, path)
+        except (OSError, AttributeError):
+            _remove(tmp_path)
+            shutil.copyfile(self.path, path)
+
+    def close(self):
+        """Unmap and delete the temp file."""
+        self._finalizer()
+
+
+def _cleanup(mapped, path):
+    if mapped is not None:
+        try:
+            mapped.close()
+        except BufferError:
+            # A memoryview is still exported; the mapping is released with it
+            pass
+    _remove(path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,273 @@
+import asyncio
+import random
+import threading
+import time
+
+import aiohttp
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from .errors import ComfyConnectionError, ComfyHTTPError, CircuitOpenError
+
+
+class RetryPolicy:
+    """
+    How failed requests are retried.
+
+    Idempotent requests (GET, uploads with overwrite, ...) are retried on
+    connection errors and on `retry_statuses`. Non-idempotent requests such as
+    `queue_prompt` are only retried when the connection could not be
+    established, so a prompt is never queued twice.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=10, retry_statuses=(429, 502, 503, 504)):
+        """
+        Args:
+            max_attempts (int): Total attempts per request, including the first one.
+            backoff (float): Base delay in seconds, doubled after every attempt.
+            max_backoff (float): Upper bound of a single delay in seconds.
+            retry_statuses (tuple): HTTP statuses that are retried.
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = tuple(retry_statuses)
+
+    def delay(self, attempt, retry_after=None):
+        """Jittered exponential delay before the next attempt ("full jitter")."""
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after)
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def should_retry(self, attempt, idempotent, connected, status=None):
+        if attempt + 1 >= self.max_attempts:
+            return False
+        if status is not None:
+            return idempotent and status in self.retry_statuses
+        return idempotent or not connected
+
+
+class CircuitBreaker:
+    """
+    Per-server circuit breaker.
+
+    After `failure_threshold` consecutive failures (connection errors or 5xx)
+    the circuit opens and requests fail immediately with `CircuitOpenError`
+    instead of each waiting for a connect timeout. After `recovery_timeout`
+    seconds one trial request is let through; its success closes the circuit.
+
+    Clients for the same server share one breaker (see `for_server`).
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30, name=None):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit. 0 disables it.
+            recovery_timeout (float): Seconds the circuit stays open before a trial request.
+            name (str, optional): Name used in error messages (the server URL). Defaults to
+                the URL of the first client the breaker is passed to.
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.name = name
+        self.failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_server(cls, base_url):
+        """Return the breaker shared by every client of `base_url`."""
+        with cls._registry_lock:
+            breaker = cls._registry.get(base_url)
+            if breaker is None:
+                breaker = cls._registry[base_url] = cls(name=base_url)
+            return breaker
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return 'half-open'
+            return 'open'
+
+    def retry_after(self):
+        """Seconds until a trial request is allowed (0 if the circuit is closed)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def before_request(self):
+        """
+        Returns:
+            bool: True if the request is the trial request of a half-open circuit. It
+            must end with `record_success`, `record_failure` or `release_trial`.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            remaining = self.recovery_timeout - (time.monotonic() - self._opened_at)
+            if remaining <= 0 and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            raise CircuitOpenError(self.name, max(0.0, remaining))
+
+    def release_trial(self):
+        """Give up a trial request that ended without an answer (e.g. it was cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failure_threshold and (self._opened_at is not None or self.failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+
+
+def _retry_after(headers):
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class SyncTransport:
+    """Sends requests for `ComfyUiClient` with retries and a circuit breaker."""
+
+    def __init__(self, retry, breaker):
+        self.retry = retry
+        self.breaker = breaker
+
+    def request(self, method, url, idempotent=True, **kwargs):
+        """
+        Send a request.
+
+        Returns:
+            requests.Response: A successful (2xx or 304) response.
+
+        Raises:
+            ComfyConnectionError: The server could not be reached.
+            ComfyHTTPError: The server answered with an error status.
+        """
+        attempt = 0
+        while True:
+            trial = self.breaker.before_request()
+            try:
+                response = requests.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                connected = not _is_connect_error(e)
+                if not self.retry.should_retry(attempt, idempotent, connected):
+                    raise ComfyConnectionError(str(e)) from e
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # Interrupted or failed before the server answered. An unreleased
+                # trial would keep the circuit half-open, rejecting every request.
+                if trial:
+                    self.breaker.release_trial()
+                raise
+
+            status = response.status_code
+            if status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if status < 400:
+                return response
+            if self.retry.should_retry(attempt, idempotent, True, status):
+                response.close()
+                time.sleep(self.retry.delay(attempt, _retry_after(response.headers)))
+                attempt += 1
+                continue
+            text = response.text
+            response.close()
+            raise ComfyHTTPError(status, text, url)
+
+
+class AsyncTransport:
+    """Sends requests for `AsyncComfyUiClient` with retries and a circuit breaker."""
+
+    def __init__(self, retry, breaker):
+        self.retry = retry
+        self.breaker = breaker
+
+    async def request(self, session, method, url, idempotent=True, **kwargs):
+        """
+        Send a request. The caller must release the response (``async with response:``).
+
+        Returns:
+            aiohttp.ClientResponse: A successful (2xx or 304) response.
+
+        Raises:
+            ComfyConnectionError: The server could not be reached.
+            ComfyHTTPError: The server answered with an error status.
+        """
+        attempt = 0
+        while True:
+            trial = self.breaker.before_request()
+            try:
+                response = await session.request(method, url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.breaker.record_failure()
+                connected = not isinstance(e, _AIOHTTP_CONNECT_ERRORS)
+                if not self.retry.should_retry(attempt, idempotent, connected):
+                    raise ComfyConnectionError(str(e) or type(e).__name__) from e
+                await asyncio.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled or failed before the server answered. An unreleased
+                # trial would keep the circuit half-open, rejecting every request.
+                if trial:
+                    self.breaker.release_trial()
+                raise
+
+            status = response.status
+            if status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if status < 400:
+                return response
+            if self.retry.should_retry(attempt, idempotent, True, status):
+                response.release()
+                await asyncio.sleep(self.retry.delay(attempt, _retry_after(response.headers)))
+                attempt += 1
+                continue
+            try:
+                text = await response.text()
+            finally:
+                response.release()
+            raise ComfyHTTPError(status, text, url)
+
+
+_AIOHTTP_CONNECT_ERRORS = (aiohttp.ClientConnectorError,) + (
+    (aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, 'ConnectionTimeoutError') else ()
+)
+
+
+def _is_connect_error(error):
+    """Whether a requests error happened before the request was sent."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return False
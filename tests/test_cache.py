@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+
+from comfyui_xy.cache import ViewCache
+from comfyui_xy.client import ComfyUiClient
+
+
+def key(name, folder_type='output'):
+    return ('http://127.0.0.1:8188', name, '', folder_type)
+
+
+class MemoryTierTest(unittest.TestCase):
+    def test_lru_byte_budget(self):
+        cache = ViewCache(max_bytes=10)
+        cache.put(key('a'), b'aaaa')
+        cache.put(key('b'), b'bbbb')
+        # Using 'a' makes 'b' the least recently used
+        self.assertEqual(cache.get(key('a')).data, b'aaaa')
+        cache.put(key('c'), b'cccc')
+        self.assertEqual(cache.size, 8)
+        self.assertIsNone(cache.get(key('b')))
+        self.assertIsNotNone(cache.get(key('a')))
+        self.assertIsNotNone(cache.get(key('c')))
+
+    def test_replace_and_oversized(self):
+        cache = ViewCache(max_bytes=10)
+        cache.put(key('a'), b'aaaa')
+        cache.put(key('a'), b'aa')
+        self.assertEqual(cache.size, 2)
+        cache.put(key('big'), b'x' * 11)
+        self.assertIsNone(cache.get(key('big')))
+        self.assertEqual(cache.size, 2)
+
+    def test_temp_and_revalidation_types(self):
+        cache = ViewCache()
+        self.assertFalse(cache.cacheable('temp'))
+        self.assertTrue(ViewCache(include_temp=True).cacheable('temp'))
+        self.assertTrue(cache.needs_revalidation('input'))
+        self.assertFalse(cache.needs_revalidation('output'))
+
+
+class DiskTierTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.directory = self._directory.name
+
+    def test_survives_restart_and_is_revalidated(self):
+        ViewCache(directory=self.directory).put(key('a'), b'data', etag='"1"')
+        cache = ViewCache(directory=self.directory)
+        entry = cache.get(key('a'))
+        self.assertEqual((entry.data, entry.etag), (b'data', '"1"'))
+        self.assertTrue(cache.needs_revalidation('output', entry))
+        cache.revalidated(entry)
+        self.assertFalse(cache.needs_revalidation('output', cache.get_memory(key('a'))))
+
+    def test_entries_without_validators_stay_in_memory(self):
+        cache = ViewCache(directory=self.directory)
+        cache.put(key('a'), b'data')
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertIsNone(ViewCache(directory=self.directory).get(key('a')))
+
+    def test_eviction(self):
+        cache = ViewCache(max_bytes=0, directory=self.directory, disk_max_bytes=100)
+        for i in range(5):
+            cache.put(key(str(i)), bytes(30), etag=f'"{i}"')
+            # Distinct modification times, oldest first
+            path = cache._disk_path(key(str(i))) + '.bin'
+            os.utime(path, (1000 + i, 1000 + i))
+        # Evicted to 90% of the budget, least recently used first
+        kept = [str(i) for i in range(5) if cache.get(key(str(i))) is not None]
+        self.assertEqual(kept, ['2', '3', '4'])
+        self.assertLessEqual(sum(size for size, _, _ in cache._disk_stats()), 90)
+
+    def test_clear(self):
+        cache = ViewCache(directory=self.directory)
+        cache.put(key('a'), b'data', etag='"1"')
+        cache.clear()
+        self.assertEqual((cache.size, os.listdir(self.directory)), (0, []))
+        self.assertIsNone(cache.get(key('a')))
+
+
+class FakeViewResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class RevalidationTest(unittest.TestCase):
+    """`get_view` with a cache, against a server that honours If-None-Match."""
+
+    def setUp(self):
+        self.files = {'a.png': (b'first', '"1"')}
+        self.requests = []
+        self.cache = ViewCache(revalidate_types=('input',))
+        self.client = ComfyUiClient(cache=self.cache)
+        self.client._request = self.request
+
+    def request(self, method, url, params=None, headers=None, **_):
+        self.requests.append(headers)
+        data, etag = self.files[params['filename']]
+        if headers and headers.get('If-None-Match') == etag:
+            return FakeViewResponse(304)
+        return FakeViewResponse(200, data, {'ETag': etag})
+
+    def test_output_hits_are_served_without_a_request(self):
+        self.assertEqual(self.client.get_view('a.png', '', 'output'), b'first')
+        self.assertEqual(self.client.get_view('a.png', '', 'output'), b'first')
+        self.assertEqual(self.requests, [{}])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_input_is_revalidated(self):
+        self.assertEqual(self.client.get_view('a.png', '', 'input'), b'first')
+        # Unchanged: 304, served from the cache
+        self.assertEqual(self.client.get_view('a.png', '', 'input'), b'first')
+        self.assertEqual(self.requests[-1], {'If-None-Match': '"1"'})
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        # Overwritten on the server: downloaded again and counted as a miss
+        self.files['a.png'] = (b'second', '"2"')
+        self.assertEqual(self.client.get_view('a.png', '', 'input'), b'second')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+        self.assertEqual(self.cache.get(key('a.png', 'input')).data, b'second')
+
+    def test_disk_entry_is_revalidated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ViewCache(directory=directory).put(key('a.png'), b'stale', etag='"0"')
+            self.cache = self.client.cache = ViewCache(directory=directory)
+            # The server cleaned up and reused the name: the stale entry is replaced
+            self.assertEqual(self.client.get_view('a.png', '', 'output'), b'first')
+            self.assertEqual(self.requests, [{'If-None-Match': '"0"'}])
+            # Now confirmed, served from memory
+            self.assertEqual(self.client.get_view('a.png', '', 'output'), b'first')
+            self.assertEqual(len(self.requests), 1)
+            self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import tempfile
+import unittest
+
+from comfyui_xy.cli import apply_job, build_jobs, job_key, parse_param, read_manifest, workflow_fingerprint
+
+
+class ParseParamTest(unittest.TestCase):
+    def test_range(self):
+        self.assertEqual(parse_param('3.seed=1:4'), ('3.seed', [1, 2, 3]))
+        self.assertEqual(parse_param('3.seed=10:0:-5'), ('3.seed', [10, 5]))
+
+    def test_json_list(self):
+        self.assertEqual(parse_param('3.cfg=[7, 7.5, "x"]'), ('3.cfg', [7, 7.5, "x"]))
+
+    def test_single_value(self):
+        self.assertEqual(parse_param('3.steps=20'), ('3.steps', [20]))
+        self.assertEqual(parse_param('6.text=a cat'), ('6.text', ['a cat']))
+        self.assertEqual(parse_param('6.text=a=b'), ('6.text', ['a=b']))
+
+    def test_invalid(self):
+        for spec in ('3.seed', 'seed=1', '3.cfg=[1,'):
+            with self.subTest(spec=spec):
+                with self.assertRaises(argparse.ArgumentTypeError):
+                    parse_param(spec)
+
+
+class BuildJobsTest(unittest.TestCase):
+    def test_grid(self):
+        jobs = build_jobs([('3.seed', [1, 2]), ('3.cfg', [7, 8])], [])
+        self.assertEqual(jobs, [
+            {'3.seed': 1, '3.cfg': 7}, {'3.seed': 1, '3.cfg': 8},
+            {'3.seed': 2, '3.cfg': 7}, {'3.seed': 2, '3.cfg': 8},
+        ])
+
+    def test_rows_times_grid(self):
+        jobs = build_jobs([('3.seed', [1, 2])], [{'6.text': 'a'}, {'6.text': 'b', '3.seed': 9}])
+        # Grid values override the row
+        self.assertEqual(jobs, [
+            {'6.text': 'a', '3.seed': 1}, {'6.text': 'a', '3.seed': 2},
+            {'6.text': 'b', '3.seed': 1}, {'6.text': 'b', '3.seed': 2},
+        ])
+
+    def test_no_params(self):
+        self.assertEqual(build_jobs([], []), [{}])
+        self.assertEqual(build_jobs([], [{'6.text': 'a'}]), [{'6.text': 'a'}])
+
+
+class ResumeTest(unittest.TestCase):
+    def test_job_key(self):
+        fingerprint = workflow_fingerprint({"3": {"inputs": {}}}, 'http://a')
+        self.assertEqual(job_key({'a.x': 1, 'b.y': 2}, fingerprint), job_key({'b.y': 2, 'a.x': 1}, fingerprint))
+        self.assertNotEqual(job_key({'a.x': 1}, fingerprint), job_key({'a.x': 2}, fingerprint))
+        # A different workflow or server does not resume from the manifest
+        self.assertNotEqual(job_key({'a.x': 1}, fingerprint), job_key({'a.x': 1}, workflow_fingerprint({}, 'http://a')))
+        self.assertNotEqual(fingerprint, workflow_fingerprint({"3": {"inputs": {}}}, 'http://b'))
+
+    def test_read_manifest_skips_completed_jobs(self):
+        fingerprint = workflow_fingerprint({}, 'http://a')
+        jobs = build_jobs([('3.seed', [1, 2, 3])], [])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'manifest.jsonl')
+            self.assertEqual(read_manifest(path), set())
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'key': job_key(jobs[0], fingerprint)}) + '\n')
+                f.write(json.dumps({'key': job_key(jobs[2], fingerprint)}) + '\n')
+                # Truncated by an interrupted run
+                f.write('{"key": "abc')
+            done = read_manifest(path)
+        pending = [job for job in jobs if job_key(job, fingerprint) not in done]
+        self.assertEqual(pending, [jobs[1]])
+
+
+class ApplyJobTest(unittest.TestCase):
+    WORKFLOW = {
+        "3": {"class_type": "KSampler", "inputs": {"seed": 0}},
+        "10": {"class_type": "LoadImage", "inputs": {"image": "example.png"}},
+    }
+
+    def test_sets_inputs_on_a_copy(self):
+        workflow = apply_job(self.WORKFLOW, {'3.seed': 42, '3.denoise': 0.5}, {})
+        self.assertEqual(workflow["3"]["inputs"], {"seed": 42, "denoise": 0.5})
+        self.assertEqual(self.WORKFLOW["3"]["inputs"], {"seed": 0})
+
+    def test_upload_substitution(self):
+        workflow = apply_job(self.WORKFLOW, {'10.image': '@photos/cat.jpg'}, {'photos/cat.jpg': 'cat (1).jpg'})
+        self.assertEqual(workflow["10"]["inputs"]["image"], 'cat (1).jpg')
+
+    def test_unknown_node(self):
+        with self.assertRaises(KeyError):
+            apply_job(self.WORKFLOW, {'99.seed': 1}, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
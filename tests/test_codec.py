@@ -0,0 +1,83 @@
+import json
+import math
+import unittest
+
+from comfyui_xy.codec import JsonCodec, StdlibCodec, available_codecs, get_codec
+
+WORKFLOW = {
+    3: {"class_type": "KSampler", "inputs": {
+        "seed": 2 ** 64 - 1, "noise_seed": -2 ** 63, "cfg": 7.5, "denoise": 0.1, "steps": 20,
+        "model": [4, 0], "latent_image": ["5", 0]}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "一只猫, café, \U0001F600, \"quoted\" \\ \n"}},
+    "7": {"class_type": "Note", "inputs": {"enabled": True, "value": None, "items": []}},
+}
+
+# What the server receives: node IDs are always strings in JSON
+EXPECTED = json.loads(json.dumps(WORKFLOW))
+
+
+class CodecTest(unittest.TestCase):
+    def codecs(self):
+        names = available_codecs()
+        self.assertIn('json', names)
+        return [get_codec(name) for name in names]
+
+    def test_round_trip(self):
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                encoded = codec.dumps(WORKFLOW)
+                self.assertIsInstance(encoded, bytes)
+                self.assertEqual(codec.loads(encoded), EXPECTED)
+                self.assertEqual(codec.loads(encoded.decode('utf-8')), EXPECTED)
+                # Readable by every other codec
+                for other in self.codecs():
+                    self.assertEqual(other.loads(encoded), EXPECTED)
+
+    def test_64_bit_seeds_are_exact(self):
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                seed = codec.loads(codec.dumps({"seed": 2 ** 64 - 1}))["seed"]
+                self.assertEqual((seed, type(seed)), (2 ** 64 - 1, int))
+
+    def test_non_ascii_str_input(self):
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                self.assertEqual(codec.loads('{"text": "一只猫 \U0001F600"}'), {"text": "一只猫 \U0001F600"})
+                self.assertEqual(codec.loads('{"text": "\\u732b \\ud83d\\ude00"}'), {"text": "猫 \U0001F600"})
+
+    def test_non_finite_floats(self):
+        # Documented difference: only the standard library keeps NaN/Infinity
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                decoded = StdlibCodec().loads(codec.dumps({"a": float('nan'), "b": float('inf')}))
+                if codec.name == 'json':
+                    self.assertTrue(math.isnan(decoded["a"]))
+                    self.assertEqual(decoded["b"], float('inf'))
+                else:
+                    self.assertEqual(decoded, {"a": None, "b": None})
+
+    def test_invalid_input(self):
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                with self.assertRaises(ValueError):
+                    codec.loads(b'{"a": ')
+
+
+class GetCodecTest(unittest.TestCase):
+    def test_resolve(self):
+        self.assertEqual(get_codec('json').name, 'json')
+        codec = StdlibCodec()
+        self.assertIs(get_codec(codec), codec)
+        self.assertEqual(get_codec().name, available_codecs()[0])
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            JsonCodec()
+
+
+if __name__ == '__main__':
+    unittest.main()
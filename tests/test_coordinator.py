@@ -0,0 +1,237 @@
+import asyncio
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from comfyui_xy import coordinator
+from comfyui_xy.client import ComfyResponse
+from comfyui_xy.codec import get_codec
+from comfyui_xy.coordinator import (Coordinator, CoordinatorClient, _read_header, _read_payload,
+                                    _write_message)
+from comfyui_xy.errors import ComfyUiError
+from comfyui_xy.storage import SpillStorage, SpilledFile
+
+
+class BufferWriter:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+
+class FramingTest(unittest.TestCase):
+    def test_round_trip(self):
+        codec = get_codec('json')
+
+        async def run():
+            writer = BufferWriter()
+            await _write_message(writer, codec, {'id': 1, 'text': "一只猫"}, [b'abc', b'', b'x' * 100])
+            await _write_message(writer, codec, {'id': 2})
+            reader = asyncio.StreamReader()
+            reader.feed_data(bytes(writer.data))
+            reader.feed_eof()
+            messages = []
+            while True:
+                header = await _read_header(reader, codec)
+                if header is None:
+                    return messages
+                payloads = [await _read_payload(reader, size) for size in header['sizes']]
+                messages.append((header, payloads))
+
+        self.assertEqual(asyncio.run(run()), [
+            ({'id': 1, 'text': "一只猫", 'sizes': [3, 0, 100]}, [b'abc', b'', b'x' * 100]),
+            ({'id': 2, 'sizes': []}, []),
+        ])
+
+    def test_spilled_payloads(self):
+        codec = get_codec('json')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        storage = SpillStorage(threshold=10, directory=directory)
+
+        async def run():
+            writer = BufferWriter()
+            await _write_message(writer, codec, {}, [b'small', b'y' * 1000])
+            reader = asyncio.StreamReader()
+            reader.feed_data(bytes(writer.data))
+            header = await _read_header(reader, codec)
+            return [await _read_payload(reader, size, storage) for size in header['sizes']]
+
+        small, large = asyncio.run(run())
+        self.assertEqual(small, b'small')
+        self.assertIsInstance(large, SpilledFile)
+        self.assertEqual(bytes(large.buffer), b'y' * 1000)
+
+        # A spilled file is sent from its memory map
+        async def resend():
+            writer = BufferWriter()
+            await _write_message(writer, codec, {}, [large])
+            return bytes(writer.data[-1000:])
+
+        self.assertEqual(asyncio.run(resend()), b'y' * 1000)
+        large.close()
+
+    def test_truncated_payload(self):
+        codec = get_codec('json')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        async def run():
+            writer = BufferWriter()
+            await _write_message(writer, codec, {}, [b'z' * 100])
+            reader = asyncio.StreamReader()
+            reader.feed_data(bytes(writer.data[:-1]))
+            reader.feed_eof()
+            header = await _read_header(reader, codec)
+            with self.assertRaises(asyncio.IncompleteReadError):
+                await _read_payload(reader, header['sizes'][0], SpillStorage(threshold=10, directory=directory))
+
+        asyncio.run(run())
+        # The partial spill file is removed
+        self.assertEqual(os.listdir(directory), [])
+
+
+def make_workflow(text):
+    return {"1": {"class_type": "CLIPTextEncode", "inputs": {"text": text}}}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def process_workflow(self, workflow):
+        self.calls += 1
+        await self.release.wait()
+        text = workflow["1"]["inputs"]["text"]
+        if text == "fail":
+            raise ComfyUiError("Workflow failed")
+        return [ComfyResponse(text.encode('utf-8'), 'a.png', 'output')]
+
+    async def close(self):
+        pass
+
+
+class CoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'c.sock')
+
+    def run_coordinator(self, test):
+        async def run():
+            client = FakeClient()
+            async with Coordinator([client], self.path) as server:
+                return await test(server, client)
+        return asyncio.run(run())
+
+    def test_identical_workflows_run_once(self):
+        async def test(server, client):
+            async with CoordinatorClient(self.path) as first, CoordinatorClient(self.path) as second:
+                tasks = [asyncio.ensure_future(requester.process_workflow(make_workflow('cat')))
+                         for requester in (first, second, first)]
+                while server.in_flight == 0:
+                    await asyncio.sleep(0.01)
+                client.release.set()
+                results = await asyncio.gather(*tasks)
+            return client.calls, [[result.data for result in outputs] for outputs in results]
+
+        self.assertEqual(self.run_coordinator(test), (1, [[b'cat']] * 3))
+
+    def test_disconnected_requester_does_not_cancel_others(self):
+        async def test(server, client):
+            async with CoordinatorClient(self.path) as staying:
+                leaving = CoordinatorClient(self.path)
+                left = asyncio.ensure_future(leaving.process_workflow(make_workflow('cat')))
+                kept = asyncio.ensure_future(staying.process_workflow(make_workflow('cat')))
+                while server.in_flight == 0:
+                    await asyncio.sleep(0.01)
+                await leaving.close()
+                self.assertEqual(await left, [])
+                await asyncio.sleep(0.05)
+                client.release.set()
+                outputs = await kept
+            return client.calls, [result.data for result in outputs], server.in_flight
+
+        self.assertEqual(self.run_coordinator(test), (1, [b'cat'], 0))
+
+    def test_errors_reach_the_requester(self):
+        async def test(server, client):
+            client.release.set()
+            async with CoordinatorClient(self.path, raise_errors=True) as requester:
+                with self.assertRaisesRegex(ComfyUiError, "Workflow failed"):
+                    await requester.process_workflow(make_workflow('fail'))
+
+        self.run_coordinator(test)
+
+    def test_socket_is_private(self):
+        async def test(server, client):
+            return stat.S_IMODE(os.stat(self.path).st_mode)
+
+        self.assertEqual(self.run_coordinator(test), 0o600)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_does_not_replace_a_live_coordinator(self):
+        async def test(server, client):
+            second = Coordinator([FakeClient()], self.path)
+            with self.assertRaisesRegex(ComfyUiError, "Another coordinator"):
+                await second.start()
+            await second.close()
+            client.release.set()
+            async with CoordinatorClient(self.path) as requester:
+                return [result.data for result in await requester.process_workflow(make_workflow('cat'))]
+
+        self.assertEqual(self.run_coordinator(test), [b'cat'])
+
+    def test_replaces_a_stale_socket(self):
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(self.path)
+        stale.close()
+
+        async def test(server, client):
+            client.release.set()
+            async with CoordinatorClient(self.path) as requester:
+                return [result.data for result in await requester.process_workflow(make_workflow('cat'))]
+
+        self.assertEqual(self.run_coordinator(test), [b'cat'])
+
+
+class DefaultSocketPathTest(unittest.TestCase):
+    def test_runtime_dir(self):
+        with mock.patch.dict(os.environ, {'XDG_RUNTIME_DIR': '/run/user/1000'}):
+            self.assertEqual(coordinator._default_socket_path(), '/run/user/1000/comfyui_xy.sock')
+
+    def test_per_user_temp_dir(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('XDG_RUNTIME_DIR', None)
+            path = coordinator._default_socket_path()
+        self.assertEqual(os.path.dirname(os.path.dirname(path)), tempfile.gettempdir())
+        self.assertNotEqual(os.path.dirname(path), tempfile.gettempdir())
+
+    def test_shared_directory_is_refused(self):
+        directory = tempfile.mkdtemp(dir=tempfile.gettempdir())
+        self.addCleanup(shutil.rmtree, directory)
+        os.chmod(directory, 0o777)
+        with self.assertRaises(ComfyUiError):
+            coordinator._prepare_directory(directory)
+        os.chmod(directory, 0o700)
+        coordinator._prepare_directory(directory)
+
+    def test_missing_directory_is_created_private(self):
+        parent = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, parent)
+        directory = os.path.join(parent, 'sockets')
+        coordinator._prepare_directory(directory)
+        self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode) & 0o077, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import io
+import unittest
+
+from PIL import Image
+
+from comfyui_xy.frames import FrameReader, ImageFrameReader, open_frames
+
+try:
+    import av
+    import numpy
+except ImportError:
+    av = None
+
+
+def make_gif(count):
+    frames = [Image.new('RGB', (16, 16), (i * 10, 0, 0)) for i in range(count)]
+    output = io.BytesIO()
+    frames[0].save(output, 'GIF', save_all=True, append_images=frames[1:], duration=40, loop=0)
+    return output.getvalue()
+
+
+def make_video(format, codec, count):
+    output = io.BytesIO()
+    container = av.open(output, 'w', format=format)
+    stream = container.add_stream(codec, rate=24)
+    stream.width = stream.height = 32
+    stream.pix_fmt = 'yuv420p'
+    for i in range(count):
+        frame = av.VideoFrame.from_ndarray(numpy.full((32, 32, 3), i * 20, dtype=numpy.uint8), format='rgb24')
+        for packet in stream.encode(frame):
+            container.mux(packet)
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()
+    return output.getvalue()
+
+
+class ImageFrameReaderTest(unittest.TestCase):
+    def test_animated(self):
+        with open_frames(make_gif(5), 'a.gif') as frames:
+            self.assertIsInstance(frames, ImageFrameReader)
+            self.assertEqual((len(frames), frames.fps), (5, 25.0))
+            self.assertEqual(frames[-1].getpixel((0, 0)), (40, 0, 0))
+            self.assertEqual([frame.getpixel((0, 0))[0] for frame in frames.iter_frames(1, step=2)], [10, 30])
+            with self.assertRaises(IndexError):
+                frames[5]
+
+    def test_still_image(self):
+        output = io.BytesIO()
+        Image.new('RGB', (8, 8), (1, 2, 3)).save(output, 'BMP')
+        with open_frames(output.getvalue(), 'a.bmp') as frames:
+            self.assertEqual((len(frames), frames.fps, frames[0].getpixel((0, 0))), (1, None, (1, 2, 3)))
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            FrameReader()
+
+
+@unittest.skipIf(av is None, "PyAV is not installed")
+class VideoFrameReaderTest(unittest.TestCase):
+    def test_counted(self):
+        with open_frames(make_video('mp4', 'libx264', 10), 'a.mp4') as frames:
+            self.assertEqual((len(frames), frames.fps), (10, 24.0))
+            self.assertEqual(len(list(frames.iter_frames())), 10)
+            frames[-1]
+
+    def test_unknown_count(self):
+        # A raw stream stores neither a frame count nor a duration
+        with open_frames(make_video('h264', 'libx264', 10), 'a.h264') as frames:
+            self.assertIsNone(frames.count)
+            with self.assertRaises(TypeError):
+                len(frames)
+            with self.assertRaises(IndexError):
+                frames[-1]
+            self.assertEqual(len(list(frames.iter_frames())), 10)
+            frames[9]
+            with self.assertRaises(IndexError):
+                frames[10]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import asyncio
+import copy
+import unittest
+
+from comfyui_xy.fusion import FusionSubmitter, batched_nodes, fuse_workflows, fusion_key, split_outputs
+
+
+def make_workflow(seed=1, text="a cat", save="SaveImage"):
+    return {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "sd15.safetensors"}},
+        "5": {"class_type": "EmptyLatentImage", "inputs": {"width": 512, "height": 512, "batch_size": 1}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": text, "clip": ["4", 1]}},
+        "3": {"class_type": "KSampler", "inputs": {"seed": seed, "model": ["4", 0], "positive": ["6", 0],
+                                                   "latent_image": ["5", 0]}},
+        "8": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["4", 2]}},
+        "9": {"class_type": save, "inputs": {"images": ["8", 0]}},
+        # Not downstream of the latent: runs once per prompt
+        "10": {"class_type": "LoadImage", "inputs": {"image": "logo.png"}},
+        "11": {"class_type": "PreviewImage", "inputs": {"images": ["10", 0]}},
+    }
+
+
+def files(*names):
+    return [{"filename": name, "subfolder": "", "type": "output"} for name in names]
+
+
+class FusionKeyTest(unittest.TestCase):
+    def test_seed_only_variants_share_a_key(self):
+        self.assertIsNotNone(fusion_key(make_workflow()))
+        self.assertEqual(fusion_key(make_workflow(seed=1)), fusion_key(make_workflow(seed=2)))
+        self.assertNotEqual(fusion_key(make_workflow(text="a cat")), fusion_key(make_workflow(text="a dog")))
+
+    def test_noise_seed(self):
+        a, b = make_workflow(), make_workflow()
+        a["3"]["inputs"]["noise_seed"] = 1
+        b["3"]["inputs"]["noise_seed"] = 2
+        self.assertEqual(fusion_key(a), fusion_key(b))
+
+    def test_not_batchable(self):
+        batched = make_workflow()
+        batched["5"]["inputs"]["batch_size"] = 2
+        two_latents = make_workflow()
+        two_latents["7"] = copy.deepcopy(two_latents["5"])
+        no_latent = make_workflow()
+        del no_latent["5"]
+        for workflow in (batched, two_latents, no_latent):
+            self.assertIsNone(fusion_key(workflow))
+
+
+class FuseWorkflowsTest(unittest.TestCase):
+    def test_batch_size(self):
+        workflows = [make_workflow(seed=seed) for seed in (7, 8, 9)]
+        fused = fuse_workflows(workflows)
+        self.assertEqual(fused["5"]["inputs"]["batch_size"], 3)
+        self.assertEqual(fused["3"]["inputs"]["seed"], 7)
+        self.assertEqual(workflows[0]["5"]["inputs"]["batch_size"], 1)
+
+
+class SplitOutputsTest(unittest.TestCase):
+    def test_batched_nodes(self):
+        self.assertEqual(batched_nodes(make_workflow()), {"5", "3", "8", "9"})
+
+    def test_split(self):
+        workflow = fuse_workflows([make_workflow(), make_workflow()])
+        outputs = {
+            "9": {"images": files("a.png", "b.png")},
+            # Two items that do not come from the batch are not split
+            "11": {"images": files("logo1.png", "logo2.png")},
+        }
+        parts = split_outputs(workflow, outputs, 2)
+        self.assertEqual([part["9"]["images"] for part in parts], [files("a.png"), files("b.png")])
+        self.assertEqual([part["11"]["images"] for part in parts], [outputs["11"]["images"]] * 2)
+
+    def test_several_files_per_request(self):
+        workflow = fuse_workflows([make_workflow(), make_workflow()])
+        parts = split_outputs(workflow, {"9": {"images": files("a", "b", "c", "d")}}, 2)
+        self.assertEqual([part["9"]["images"] for part in parts], [files("a", "b"), files("c", "d")])
+
+    def test_combined_batch_cannot_be_split(self):
+        workflow = fuse_workflows([make_workflow(save="SaveAnimatedWEBP")] * 2)
+        with self.assertRaises(ValueError):
+            split_outputs(workflow, {"9": {"images": files("anim.webp"), "animated": [True]}}, 2)
+
+
+class FakeClient:
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.queued = []
+
+    async def queue_prompt(self, workflow):
+        self.queued.append(workflow)
+        return f"p{len(self.queued)}"
+
+    async def wait_for_execution(self, prompt_id):
+        workflow = self.queued[int(prompt_id[1:]) - 1]
+        return self.outputs(workflow["5"]["inputs"]["batch_size"])
+
+    async def _fetch_outputs(self, outputs):
+        return [item["filename"] for node_output in outputs.values() for value in node_output.values()
+                for item in value if isinstance(item, dict)]
+
+    async def process_workflow(self, workflow):
+        return await self._fetch_outputs(await self.wait_for_execution(await self.queue_prompt(workflow)))
+
+
+class FusionSubmitterTest(unittest.TestCase):
+    def run_all(self, client, workflows, **kwargs):
+        async def run():
+            fusion = FusionSubmitter(client, **kwargs)
+            results = await asyncio.gather(*[fusion.process_workflow(workflow) for workflow in workflows])
+            return fusion, results
+        return asyncio.run(run())
+
+    def test_fuses_and_splits(self):
+        client = FakeClient(lambda size: {"9": {"images": files(*[f"img{i}.png" for i in range(size)])}})
+        fusion, results = self.run_all(client, [make_workflow(seed=seed) for seed in range(5)], max_batch=4)
+        self.assertEqual([workflow["5"]["inputs"]["batch_size"] for workflow in client.queued], [4, 1])
+        self.assertEqual(results, [["img0.png"], ["img1.png"], ["img2.png"], ["img3.png"], ["img0.png"]])
+        self.assertEqual(fusion._tasks, set())
+
+    def test_unsplittable_batch_is_run_one_by_one(self):
+        client = FakeClient(lambda size: {"9": {"images": files(f"anim_{size}.webp"), "animated": [True]}})
+        workflows = [make_workflow(seed=seed, save="SaveAnimatedWEBP") for seed in range(2)]
+        fusion, results = self.run_all(client, workflows)
+        self.assertEqual([workflow["5"]["inputs"]["batch_size"] for workflow in client.queued], [2, 1, 1])
+        self.assertEqual(results, [["anim_1.webp"], ["anim_1.webp"]])
+        self.assertEqual(len(fusion._unfusable), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
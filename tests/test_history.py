@@ -0,0 +1,217 @@
+import asyncio
+import contextlib
+import io
+import json
+import unittest
+
+import requests
+
+from comfyui_xy.client import AsyncComfyUiClient, ComfyUiClient
+from comfyui_xy.history import HistoryScan, JsonObjectStream
+
+
+def parse(data, chunk_size):
+    parser = JsonObjectStream()
+    items = []
+    for i in range(0, len(data), chunk_size):
+        items.extend(parser.feed(data[i:i + chunk_size]))
+    items.extend(parser.close())
+    return items
+
+
+class JsonObjectStreamTest(unittest.TestCase):
+    DOC = {
+        "p1": {"outputs": {"9": {"images": [{"filename": "a.png", "subfolder": "", "type": "output"}]}}},
+        "p2": {"text": "braces {[ and quotes \" in strings ]}", "nested": [[[]], {}, [{"a": [1, 2]}]]},
+        "p3": "string ending in a backslash \\",
+        "p4": "\\\\\\\"}",
+        "p5": "héllo 😀",
+        "p6": -12.5e3,
+        "p7": True,
+        "p8": None,
+        "p9": [],
+        "p10": {},
+    }
+
+    def test_every_chunk_size(self):
+        for ensure_ascii in (True, False):
+            data = json.dumps(self.DOC, ensure_ascii=ensure_ascii, indent=1).encode('utf-8')
+            for chunk_size in range(1, 40):
+                with self.subTest(ensure_ascii=ensure_ascii, chunk_size=chunk_size):
+                    self.assertEqual(parse(data, chunk_size), list(self.DOC.items()))
+
+    def test_members_are_returned_as_they_complete(self):
+        parser = JsonObjectStream()
+        self.assertEqual(parser.feed(b'{"a": {"b": [1, '), [])
+        self.assertEqual(parser.feed(b'2]}, "c": 3'), [("a", {"b": [1, 2]})])
+        # The number may still continue
+        self.assertEqual(parser.feed(b'4'), [])
+        self.assertEqual(parser.feed(b'}'), [("c", 34)])
+        self.assertEqual(parser.close(), [])
+
+    def test_str_chunks(self):
+        self.assertEqual(parse('{"a": "é", "b": [true]}', 3), [("a", "é"), ("b", [True])])
+
+    def test_empty_object(self):
+        self.assertEqual(parse(b' { } ', 1), [])
+
+    def test_large_member(self):
+        member = {str(i): {"class_type": "KSampler", "inputs": {"text": "x}" * 20, "seed": i}} for i in range(5000)}
+        data = json.dumps({"big": member, "small": 1}).encode('utf-8')
+        self.assertEqual(parse(data, 4096), [("big", member), ("small", 1)])
+
+    def test_invalid_documents(self):
+        for data in (b'[1]', b'{"a" 1}', b'{"a": 1 2}', b'{"a": {"b": 1]}', b'{"a": [1,}', b'{"a": 1} x'):
+            for chunk_size in (1, 3, 100):
+                with self.subTest(data=data, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        parse(data, chunk_size)
+
+    def test_incomplete_documents(self):
+        for data in (b'', b'{', b'{"a": 1', b'{"a": {"b": ', b'{"a": "x}'):
+            with self.subTest(data=data):
+                with self.assertRaises(ValueError):
+                    parse(data, 2)
+
+
+class HistoryScanTest(unittest.TestCase):
+    def test_entries_after_since(self):
+        scan = HistoryScan('p2')
+        for prompt_id in ('p1', 'p2', 'p3', 'p4'):
+            scan.add(prompt_id, {'id': prompt_id})
+        self.assertTrue(scan.found)
+        self.assertEqual([prompt_id for prompt_id, _ in scan.entries], ['p3', 'p4'])
+        self.assertTrue(scan.is_complete(max_items=4))
+
+    def test_since_newest(self):
+        scan = HistoryScan('p2')
+        scan.add('p1', {})
+        scan.add('p2', {})
+        self.assertEqual(scan.entries, [])
+
+    def test_full_page_without_since_is_incomplete(self):
+        scan = HistoryScan('p0')
+        for prompt_id in ('p1', 'p2'):
+            scan.add(prompt_id, {})
+        self.assertFalse(scan.found)
+        self.assertFalse(scan.is_complete(max_items=2))
+        # A short page is the whole history: `since` was evicted
+        self.assertTrue(scan.is_complete(max_items=3))
+
+    def test_no_since(self):
+        scan = HistoryScan(None)
+        scan.add('p1', {})
+        self.assertEqual(scan.entries, [('p1', {})])
+
+
+class FakeHistoryServer:
+    """Serves the newest `max_items` of a history, optionally cut off half-way."""
+
+    def __init__(self, prompt_ids, cut=False):
+        self.prompt_ids = prompt_ids
+        self.cut = cut
+
+    def chunks(self, params):
+        max_items = int(params.get('max_items', len(self.prompt_ids)))
+        history = {prompt_id: {"outputs": {}} for prompt_id in self.prompt_ids[-max_items:]}
+        data = json.dumps(history).encode('utf-8')
+        yield data[:len(data) // 2]
+        if self.cut:
+            raise requests.exceptions.ChunkedEncodingError("Connection broken")
+        yield data[len(data) // 2:]
+
+
+class FakeSyncResponse:
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def iter_content(self, chunk_size):
+        return self._chunks
+
+
+class FakeAsyncContent:
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    async def iter_chunked(self, chunk_size):
+        for chunk in self._chunks:
+            yield chunk
+
+
+class FakeAsyncResponse:
+    def __init__(self, chunks):
+        self.content = FakeAsyncContent(chunks)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+PROMPT_IDS = [f"p{i}" for i in range(1, 11)]
+
+
+class IterNewHistoryTest(unittest.TestCase):
+    def client(self, server, **kwargs):
+        client = ComfyUiClient(**kwargs)
+        client._request = lambda method, url, params=None, **_: FakeSyncResponse(server.chunks(params))
+        return client
+
+    def test_pages_until_since_is_found(self):
+        client = self.client(FakeHistoryServer(PROMPT_IDS))
+        client.last_history_id = 'p3'
+        new = [prompt_id for prompt_id, _ in client.iter_new_history(page_size=4)]
+        self.assertEqual(new, PROMPT_IDS[3:])
+        self.assertEqual(client.last_history_id, 'p10')
+
+    def test_cut_off_page_yields_nothing(self):
+        client = self.client(FakeHistoryServer(PROMPT_IDS, cut=True))
+        client.last_history_id = 'p3'
+        with contextlib.redirect_stdout(io.StringIO()):
+            new = list(client.iter_new_history(page_size=4))
+        self.assertEqual(new, [])
+        self.assertEqual(client.last_history_id, 'p3')
+
+    def test_cut_off_page_raises(self):
+        client = self.client(FakeHistoryServer(PROMPT_IDS, cut=True), raise_errors=True)
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            list(client.iter_new_history(since='p3', page_size=4))
+
+
+class AsyncIterNewHistoryTest(unittest.TestCase):
+    def client(self, server, **kwargs):
+        client = AsyncComfyUiClient(**kwargs)
+
+        async def request(method, url, params=None, **_):
+            return FakeAsyncResponse(server.chunks(params))
+
+        client._request = request
+        return client
+
+    def new_history(self, client, **kwargs):
+        async def collect():
+            return [prompt_id async for prompt_id, _ in client.iter_new_history(**kwargs)]
+        return asyncio.run(collect())
+
+    def test_pages_until_since_is_found(self):
+        client = self.client(FakeHistoryServer(PROMPT_IDS))
+        client.last_history_id = 'p3'
+        self.assertEqual(self.new_history(client, page_size=4), PROMPT_IDS[3:])
+        self.assertEqual(client.last_history_id, 'p10')
+
+    def test_cut_off_page_yields_nothing(self):
+        client = self.client(FakeHistoryServer(PROMPT_IDS, cut=True))
+        client.last_history_id = 'p3'
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(self.new_history(client, page_size=4), [])
+        self.assertEqual(client.last_history_id, 'p3')
+
+if __name__ == '__main__':
+    unittest.main()
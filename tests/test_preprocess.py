@@ -0,0 +1,119 @@
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from comfyui_xy.preprocess import ImageTransform, target_size
+
+
+def load_image(node_id="10"):
+    return {node_id: {"class_type": "LoadImage", "inputs": {"image": "example.png"}}}
+
+
+class TargetSizeTest(unittest.TestCase):
+    def test_image_scale(self):
+        workflow = load_image()
+        workflow["11"] = {"class_type": "ImageScale", "inputs": {
+            "image": ["10", 0], "width": 768, "height": 512, "upscale_method": "lanczos", "crop": "center"}}
+        self.assertEqual(target_size(workflow, "10"), (768, 512))
+        self.assertEqual(target_size(workflow, 10), (768, 512))
+
+    def test_crop_is_not_a_resize(self):
+        workflow = load_image()
+        workflow["11"] = {"class_type": "ImageCrop", "inputs": {
+            "image": ["10", 0], "width": 683, "height": 512, "x": 1500, "y": 1000}}
+        self.assertIsNone(target_size(workflow, "10"))
+
+    def test_other_consumer_keeps_the_size(self):
+        workflow = load_image()
+        workflow["11"] = {"class_type": "ImageScale", "inputs": {"image": ["10", 0], "width": 768, "height": 512}}
+        workflow["12"] = {"class_type": "VAEEncodeForInpaint", "inputs": {"pixels": ["10", 0], "mask": ["10", 1]}}
+        self.assertIsNone(target_size(workflow, "10"))
+
+    def test_several_resizes_are_all_covered(self):
+        workflow = load_image()
+        workflow["11"] = {"class_type": "ImageScale", "inputs": {"image": ["10", 0], "width": 768, "height": 512}}
+        workflow["12"] = {"class_type": "ImageScale", "inputs": {"image": ["10", 0], "width": 512, "height": 640}}
+        self.assertEqual(target_size(workflow, "10"), (768, 640))
+
+    def test_size_from_the_image(self):
+        workflow = load_image()
+        workflow["11"] = {"class_type": "ImageScale", "inputs": {"image": ["10", 0], "width": 0, "height": 512}}
+        self.assertIsNone(target_size(workflow, "10"))
+
+    def test_unused(self):
+        workflow = load_image()
+        workflow["11"] = {"class_type": "ImageScale", "inputs": {"image": ["9", 0], "width": 768, "height": 512}}
+        self.assertIsNone(target_size(workflow, "10"))
+
+
+class TargetScaleTest(unittest.TestCase):
+    def test_no_options(self):
+        self.assertEqual(ImageTransform()._target_scale(4000, 3000), 1.0)
+
+    def test_max_side(self):
+        self.assertEqual(ImageTransform(max_side=1000)._target_scale(4000, 3000), 0.25)
+        self.assertEqual(ImageTransform(max_side=1000)._target_scale(3000, 4000), 0.25)
+
+    def test_size_covers_the_target(self):
+        # 1024/4000 < 512/1500: the height decides
+        self.assertAlmostEqual(ImageTransform(size=(1024, 512))._target_scale(4000, 1500), 512 / 1500)
+        self.assertAlmostEqual(ImageTransform(size=(1024, 512))._target_scale(4000, 3000), 1024 / 4000)
+
+    def test_never_upscales(self):
+        self.assertEqual(ImageTransform(max_side=4096, size=(2048, 2048))._target_scale(640, 480), 1.0)
+
+    def test_smallest_wins(self):
+        self.assertEqual(ImageTransform(max_side=500, size=(1024, 1024))._target_scale(2000, 2000), 0.25)
+
+
+class ApplyTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def write(self, image, name, **save_kwargs):
+        path = os.path.join(self._directory.name, name)
+        image.save(path, **save_kwargs)
+        return path
+
+    def test_unchanged(self):
+        path = self.write(Image.new('RGB', (64, 48), 'red'), 'photo.png')
+        with open(path, 'rb') as f:
+            original = f.read()
+        data, filename = ImageTransform(strip_metadata=False).apply(path)
+        self.assertEqual((data, filename), (original, 'photo.png'))
+
+    def test_resize_and_reencode(self):
+        path = self.write(Image.new('RGB', (400, 300), 'red'), 'photo.png')
+        data, filename = ImageTransform(max_side=100, format='jpeg').apply(path)
+        self.assertEqual(filename, 'photo.jpeg')
+        image = Image.open(io.BytesIO(data))
+        self.assertEqual((image.format, image.size), ('JPEG', (100, 75)))
+
+    def test_cmyk(self):
+        path = self.write(Image.new('CMYK', (40, 30), (0, 255, 255, 0)), 'print.jpg')
+        for format, mode in (('png', 'RGB'), ('webp', 'RGB'), ('jpeg', 'RGB'), (None, 'RGB')):
+            with self.subTest(format=format):
+                data, _ = ImageTransform(format=format).apply(path)
+                self.assertEqual(Image.open(io.BytesIO(data)).mode, mode)
+
+    def test_transparency_is_kept(self):
+        path = self.write(Image.new('LA', (40, 30), (128, 0)), 'mask.png')
+        data, _ = ImageTransform(format='webp').apply(path)
+        self.assertEqual(Image.open(io.BytesIO(data)).mode, 'RGBA')
+        data, _ = ImageTransform(format='png').apply(path)
+        self.assertEqual(Image.open(io.BytesIO(data)).mode, 'LA')
+
+    def test_for_node(self):
+        workflow = load_image()
+        workflow["11"] = {"class_type": "ImageScale", "inputs": {"image": ["10", 0], "width": 100, "height": 100}}
+        path = self.write(Image.new('RGB', (400, 200), 'red'), 'photo.png')
+        data, _ = ImageTransform.for_node(workflow, "10").apply(path)
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (200, 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
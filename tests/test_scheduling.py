@@ -0,0 +1,153 @@
+import asyncio
+import unittest
+
+from comfyui_xy.scheduling import AffinityScheduler, _Job, affinity_key, subgraph_hashes
+
+
+def make_workflow(ckpt, text="a cat", seed=1, lora=None):
+    workflow = {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ckpt}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": text, "clip": ["4", 1]}},
+        "3": {"class_type": "KSampler", "inputs": {"seed": seed, "model": ["4", 0], "positive": ["6", 0]}},
+    }
+    if lora:
+        workflow["10"] = {"class_type": "LoraLoader", "inputs": {"lora_name": lora, "strength_model": 1.0,
+                                                                 "model": ["4", 0], "clip": ["4", 1]}}
+    return workflow
+
+
+class AffinityKeyTest(unittest.TestCase):
+    def test_loader_inputs(self):
+        self.assertEqual(affinity_key(make_workflow("a.safetensors", lora="l.safetensors")),
+                         (('ckpt_name', 'a.safetensors'), ('lora_name', 'l.safetensors')))
+
+    def test_ignores_other_nodes(self):
+        self.assertEqual(affinity_key(make_workflow("a", text="x")), affinity_key(make_workflow("a", text="y")))
+        self.assertEqual(affinity_key({"1": {"class_type": "KSampler", "inputs": {"sampler_name": "euler"}}}), ())
+
+
+class SubgraphHashesTest(unittest.TestCase):
+    def test_shared_prefix(self):
+        a = subgraph_hashes(make_workflow("a", seed=1))
+        b = subgraph_hashes(make_workflow("a", seed=2))
+        # The loader and the text encoder are shared, the sampler is not
+        self.assertEqual(len(a), 3)
+        self.assertEqual(len(a & b), 2)
+        self.assertEqual(len(a & subgraph_hashes(make_workflow("b", seed=1))), 0)
+
+    def test_equal_for_equal_graphs(self):
+        self.assertEqual(subgraph_hashes(make_workflow("a")), subgraph_hashes(make_workflow("a")))
+
+    def test_cycle_and_dangling_link(self):
+        workflow = {
+            "1": {"class_type": "A", "inputs": {"x": ["2", 0]}},
+            "2": {"class_type": "B", "inputs": {"x": ["1", 0], "y": ["99", 0]}},
+        }
+        self.assertEqual(len(subgraph_hashes(workflow)), 2)
+
+
+class FakeClient:
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    async def process_workflow(self, workflow):
+        self.log.append((self.name, workflow["4"]["inputs"]["ckpt_name"], workflow["3"]["inputs"]["seed"]))
+        await asyncio.sleep(0)
+        return [workflow["3"]["inputs"]["seed"]]
+
+    async def close(self):
+        pass
+
+
+class PickTest(unittest.TestCase):
+    def scheduler(self, workflows, fairness_window=8, servers=1):
+        scheduler = AffinityScheduler([FakeClient(str(i), []) for i in range(servers)],
+                                      fairness_window=fairness_window)
+        scheduler._pending = [_Job(workflow, None) for workflow in workflows]
+        return scheduler
+
+    def pick_all(self, scheduler, server):
+        order = []
+        while scheduler._pending:
+            job = scheduler._pick(server)
+            server.last_key, server.last_hashes = job.key, job.hashes
+            order.append((job.workflow["4"]["inputs"]["ckpt_name"], job.workflow["3"]["inputs"]["seed"]))
+        return order
+
+    def test_groups_by_model(self):
+        workflows = [make_workflow(ckpt, seed=i) for i, ckpt in enumerate("ABABAB")]
+        scheduler = self.scheduler(workflows)
+        order = self.pick_all(scheduler, scheduler._servers[0])
+        self.assertEqual(order, [('A', 0), ('A', 2), ('A', 4), ('B', 1), ('B', 3), ('B', 5)])
+
+    def test_prefers_shared_subgraphs(self):
+        workflows = [make_workflow("A", text="x", seed=1), make_workflow("A", text="y", seed=2),
+                     make_workflow("A", text="x", seed=3)]
+        scheduler = self.scheduler(workflows)
+        server = scheduler._servers[0]
+        order = self.pick_all(scheduler, server)
+        self.assertEqual(order, [('A', 1), ('A', 3), ('A', 2)])
+
+    def test_avoids_models_claimed_by_other_servers(self):
+        scheduler = self.scheduler([make_workflow("A", seed=1), make_workflow("B", seed=2)], servers=2)
+        first, second = scheduler._servers
+        first.last_key = affinity_key(make_workflow("A"))
+        self.assertEqual(scheduler._score(scheduler._pending[0], second), (False, False, 0))
+        self.assertEqual(scheduler._pick(second).workflow["4"]["inputs"]["ckpt_name"], "B")
+        self.assertEqual(scheduler._pick(first).workflow["4"]["inputs"]["ckpt_name"], "A")
+
+    def test_only_the_window_is_considered(self):
+        workflows = [make_workflow("B", seed=0), make_workflow("B", seed=1), make_workflow("A", seed=2)]
+        scheduler = self.scheduler(workflows, fairness_window=2)
+        server = scheduler._servers[0]
+        server.last_key = affinity_key(make_workflow("A"))
+        # The matching workflow is outside the window
+        self.assertEqual(scheduler._pick(server).workflow["3"]["inputs"]["seed"], 0)
+
+    def test_no_starvation(self):
+        # One B among a steady stream of A: it is passed over at most fairness_window times
+        scheduler = self.scheduler([make_workflow("B", seed=-1)], fairness_window=3)
+        server = scheduler._servers[0]
+        server.last_key = affinity_key(make_workflow("A"))
+        picked = []
+        for seed in range(20):
+            scheduler._pending.append(_Job(make_workflow("A", seed=seed), None))
+            job = scheduler._pick(server)
+            server.last_key = job.key
+            picked.append(job.workflow["3"]["inputs"]["seed"])
+            if picked[-1] == -1:
+                break
+        self.assertEqual(picked, [0, 1, 2, -1])
+
+
+class AffinitySchedulerTest(unittest.TestCase):
+    def test_every_workflow_completes_on_the_server_with_its_model(self):
+        log = []
+
+        async def run():
+            async with AffinityScheduler([FakeClient("gpu1", log), FakeClient("gpu2", log)]) as scheduler:
+                workflows = [make_workflow(ckpt, seed=i) for i, ckpt in enumerate("ABABABAB")]
+                return await asyncio.gather(*[scheduler.process_workflow(workflow) for workflow in workflows])
+
+        results = asyncio.run(run())
+        self.assertEqual(results, [[i] for i in range(8)])
+        servers = {ckpt: {name for name, model, _ in log if model == ckpt} for ckpt in "AB"}
+        # Each model stays on one server after the first pick
+        self.assertEqual(len(servers["A"] | servers["B"]), 2)
+        self.assertTrue(all(len(names) == 1 for names in servers.values()))
+
+    def test_close_cancels_pending(self):
+        async def run():
+            scheduler = AffinityScheduler([FakeClient("gpu1", [])])
+            task = asyncio.ensure_future(scheduler.process_workflow(make_workflow("A")))
+            await asyncio.sleep(0)
+            await scheduler.close()
+            await asyncio.gather(task, return_exceptions=True)
+            return task
+
+        self.assertTrue(asyncio.run(run()).cancelled())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import aiohttp
+
+from comfyui_xy.client import AsyncComfyUiClient
+from comfyui_xy.storage import SpilledFile, SpillStorage
+
+
+class SpillWriterTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.directory = self._directory.name
+        self.storage = SpillStorage(threshold=10, directory=self.directory)
+
+    def spill_files(self):
+        return [name for name in os.listdir(self.directory) if name.endswith('.spill')]
+
+    def test_small_download_stays_in_memory(self):
+        writer = self.storage.writer()
+        for chunk in (b'abc', b'defghij'):
+            writer.write(chunk)
+        self.assertEqual(writer.finish(), b'abcdefghij')
+        self.assertEqual(self.spill_files(), [])
+
+    def test_spills_past_the_threshold(self):
+        writer = self.storage.writer()
+        for chunk in (b'abcdef', b'ghijkl', b'mno'):
+            writer.write(chunk)
+        spilled = writer.finish()
+        self.assertIsInstance(spilled, SpilledFile)
+        self.assertEqual((len(spilled), bytes(spilled.buffer)), (15, b'abcdefghijklmno'))
+        self.assertEqual(len(self.spill_files()), 1)
+        spilled.close()
+        self.assertEqual(self.spill_files(), [])
+
+    def test_expected_size_spills_up_front(self):
+        writer = self.storage.writer(expected_size='11')
+        self.assertEqual(len(self.spill_files()), 1)
+        writer.write(b'x' * 11)
+        spilled = writer.finish()
+        self.assertEqual(bytes(spilled.buffer), b'x' * 11)
+        spilled.close()
+
+    def test_abort(self):
+        writer = self.storage.writer()
+        writer.write(b'x' * 20)
+        self.assertEqual(len(self.spill_files()), 1)
+        writer.abort()
+        self.assertEqual(self.spill_files(), [])
+        # Aborting an in-memory download is a no-op
+        self.storage.writer().abort()
+
+    def test_empty_spilled_file(self):
+        spilled = self.storage.writer(expected_size=100).finish()
+        self.assertEqual((len(spilled), bytes(spilled.buffer)), (0, b''))
+        spilled.close()
+
+
+class SpilledFileSaveTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.directory = self._directory.name
+        writer = SpillStorage(threshold=0, directory=self.directory).writer()
+        writer.write(b'video bytes')
+        self.spilled = writer.finish()
+        self.addCleanup(self.spilled.close)
+        self.target = os.path.join(self.directory, 'out.mp4')
+
+    def read_target(self):
+        with open(self.target, 'rb') as f:
+            return f.read()
+
+    def test_hardlink(self):
+        self.spilled.save(self.target)
+        self.assertEqual(self.read_target(), b'video bytes')
+        self.assertTrue(os.path.samefile(self.spilled.path, self.target))
+        # The saved file outlives the temp file
+        self.spilled.close()
+        self.assertFalse(os.path.exists(self.spilled.path))
+        self.assertEqual(self.read_target(), b'video bytes')
+
+    def test_copy_fallback(self):
+        with mock.patch('os.link', side_effect=OSError("Invalid cross-device link")):
+            self.spilled.save(self.target)
+        self.assertEqual(self.read_target(), b'video bytes')
+        self.assertFalse(os.path.samefile(self.spilled.path, self.target))
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted([os.path.basename(self.spilled.path), 'out.mp4']))
+
+    def test_replaces_an_existing_file(self):
+        with open(self.target, 'wb') as f:
+            f.write(b'old')
+        self.spilled.save(self.target)
+        self.assertEqual(self.read_target(), b'video bytes')
+
+
+class FakeContent:
+    async def iter_chunked(self, chunk_size):
+        yield b'x' * 20
+        raise aiohttp.ClientPayloadError("Response payload is not completed")
+
+
+class FakeViewResponse:
+    status = 200
+    headers = {'Content-Length': '40'}
+    content = FakeContent()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class AsyncGetViewSpillTest(unittest.TestCase):
+    def test_failed_download_is_discarded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            client = AsyncComfyUiClient()
+
+            async def request(method, url, **_):
+                return FakeViewResponse()
+
+            client._request = request
+            storage = SpillStorage(threshold=10, directory=directory)
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = asyncio.run(client.get_view('a.mp4', '', 'output', storage))
+            self.assertIsNone(result)
+            self.assertEqual(os.listdir(directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
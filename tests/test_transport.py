@@ -0,0 +1,148 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from comfyui_xy.client import AsyncComfyUiClient, ComfyUiClient
+from comfyui_xy.errors import CircuitOpenError
+from comfyui_xy.transport import AsyncTransport, CircuitBreaker, RetryPolicy, SyncTransport
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_attempts(self):
+        retry = RetryPolicy(max_attempts=3)
+        self.assertTrue(retry.should_retry(0, True, True))
+        self.assertTrue(retry.should_retry(1, True, True))
+        self.assertFalse(retry.should_retry(2, True, True))
+        self.assertFalse(RetryPolicy(max_attempts=1).should_retry(0, True, False))
+
+    def test_connection_errors(self):
+        retry = RetryPolicy()
+        # A non-idempotent request may have reached the server once connected
+        self.assertTrue(retry.should_retry(0, False, False))
+        self.assertFalse(retry.should_retry(0, False, True))
+        self.assertTrue(retry.should_retry(0, True, True))
+
+    def test_statuses(self):
+        retry = RetryPolicy(retry_statuses=(429, 503))
+        self.assertTrue(retry.should_retry(0, True, True, 503))
+        self.assertTrue(retry.should_retry(0, True, True, 429))
+        self.assertFalse(retry.should_retry(0, True, True, 500))
+        self.assertFalse(retry.should_retry(0, True, True, 404))
+        self.assertFalse(retry.should_retry(0, False, True, 503))
+
+    def test_delay(self):
+        retry = RetryPolicy(backoff=0.5, max_backoff=3)
+        for attempt, bound in ((0, 0.5), (1, 1.0), (2, 2.0), (3, 3), (10, 3)):
+            for _ in range(50):
+                self.assertTrue(0 <= retry.delay(attempt) <= bound)
+
+    def test_retry_after(self):
+        retry = RetryPolicy(max_backoff=10)
+        self.assertEqual(retry.delay(0, retry_after=4), 4)
+        self.assertEqual(retry.delay(0, retry_after=60), 10)
+
+
+def open_breaker(recovery_timeout):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=recovery_timeout, name='http://gpu1')
+    for _ in range(2):
+        breaker.before_request()
+        breaker.record_failure()
+    return breaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+        for _ in range(2):
+            breaker.record_failure()
+        breaker.record_success()
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertFalse(breaker.before_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError) as raised:
+            breaker.before_request()
+        self.assertGreater(raised.exception.retry_after, 29)
+        self.assertGreater(breaker.retry_after(), 29)
+
+    def test_disabled(self):
+        breaker = CircuitBreaker(failure_threshold=0)
+        for _ in range(100):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertFalse(breaker.before_request())
+
+    def test_one_trial_when_half_open(self):
+        breaker = open_breaker(recovery_timeout=0)
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.before_request())
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+
+    def test_trial_success_closes(self):
+        breaker = open_breaker(recovery_timeout=0)
+        breaker.before_request()
+        breaker.record_success()
+        self.assertEqual((breaker.state, breaker.failures), ('closed', 0))
+        self.assertFalse(breaker.before_request())
+
+    def test_trial_failure_reopens(self):
+        breaker = open_breaker(recovery_timeout=0)
+        breaker.before_request()
+        breaker.recovery_timeout = 30
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+    def test_released_trial(self):
+        breaker = open_breaker(recovery_timeout=0)
+        self.assertTrue(breaker.before_request())
+        breaker.release_trial()
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.before_request())
+
+    def test_error_names_the_server(self):
+        breaker = open_breaker(recovery_timeout=30)
+        with self.assertRaisesRegex(CircuitOpenError, 'http://gpu1'):
+            breaker.before_request()
+
+    def test_clients_name_unnamed_breakers(self):
+        breaker = CircuitBreaker()
+        ComfyUiClient(url='http://gpu1:8188', breaker=breaker)
+        self.assertEqual(breaker.name, 'http://gpu1:8188')
+        AsyncComfyUiClient(url='http://gpu2:8188', breaker=breaker)
+        self.assertEqual(breaker.name, 'http://gpu1:8188')
+        self.assertEqual(CircuitBreaker.for_server('http://gpu3:8188').name, 'http://gpu3:8188')
+
+
+class HangingSession:
+    async def request(self, method, url, **kwargs):
+        await asyncio.sleep(3600)
+
+
+class InterruptedTrialTest(unittest.TestCase):
+    def test_cancelled_async_trial_is_released(self):
+        breaker = open_breaker(recovery_timeout=0)
+        transport = AsyncTransport(RetryPolicy(), breaker)
+
+        async def cancelled_trial():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(transport.request(HangingSession(), 'GET', 'http://gpu1/queue'), 0.01)
+
+        asyncio.run(cancelled_trial())
+        self.assertEqual(breaker.state, 'half-open')
+        # The next request is let through as the new trial
+        self.assertTrue(breaker.before_request())
+
+    def test_interrupted_sync_trial_is_released(self):
+        breaker = open_breaker(recovery_timeout=0)
+        transport = SyncTransport(RetryPolicy(), breaker)
+        with mock.patch('requests.request', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                transport.request('GET', 'http://gpu1/queue')
+        self.assertTrue(breaker.before_request())
+
+
+if __name__ == '__main__':
+    unittest.main()